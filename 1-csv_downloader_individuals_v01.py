@@ -1,8 +1,11 @@
 import os
+import sys
 import datetime
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from raw_loader import build_cache
+from http_download import fetch_to_file
 
 # --- 設定 ---
 CSV_URL = "https://csvex.com/kabu.plus/csv/japan-all-stock-prices/daily/japan-all-stock-prices.csv"
@@ -32,8 +35,6 @@ def download_csv(save_dir=SAVE_DIR, url=CSV_URL, use_basic_auth=True):
 
     today = datetime.datetime.now().strftime("%Y%m%d")
     filename = f"japan-all-stock-prices_{today}.csv"
-    tmp_name = filename + ".part"
-    save_path_tmp = os.path.join(save_dir, tmp_name)
     save_path = os.path.join(save_dir, filename)
 
     id_, pw = get_credentials_from_env()
@@ -41,28 +42,33 @@ def download_csv(save_dir=SAVE_DIR, url=CSV_URL, use_basic_auth=True):
 
     print(f"📥 Downloading CSV from {url} ...")
 
+    auth = (id_, pw) if use_basic_auth and id_ and pw else None  # 認証情報が無い／使わない場合は公開URL向け
     try:
-        if use_basic_auth and id_ and pw:
-            # Basic認証を付けてGET（推奨）
-            response = session.get(url, auth=(id_, pw), timeout=TIMEOUT)
-        else:
-            # 認証情報が無い／使わない場合（公開URL向け）
-            response = session.get(url, timeout=TIMEOUT)
-
-    except requests.RequestException as e:
+        # .part にストリーム保存し、前回の ETag / Last-Modified で条件付きリクエスト
+        status, response = fetch_to_file(session, url, save_path, auth=auth, timeout=TIMEOUT)
+    except (requests.RequestException, IOError) as e:
         print(f"❌ リクエストエラー: {e}")
         return None
 
     # ステータス別の処理
-    if response.status_code == 200:
-        # 一時ファイルに書いてからリネーム（途中で落ちても壊れない）
-        with open(save_path_tmp, "wb") as f:
-            f.write(response.content)
-        os.replace(save_path_tmp, save_path)
+    if status in ("not_modified", "unchanged"):
+        # 本日分は取得済み（304 または同一内容）→ 既存ファイルとキャッシュをそのまま使う
+        print(f"⏭ 変更なし（{'304 Not Modified' if status == 'not_modified' else '同一内容'}）→ {save_path}")
+        return save_path
+
+    if status == "downloaded":
         print(f"✅ Downloaded successfully → {save_path}")
+
+        # 型付き Parquet キャッシュを作成（後続処理はこちらを読む）
+        try:
+            cache_path = build_cache(save_path)
+            if cache_path:
+                print(f"🗂 Cache created → {cache_path}")
+        except Exception as e:
+            print(f"⚠️ キャッシュ作成に失敗（CSVはそのまま利用可）: {e}")
         return save_path
 
-    elif response.status_code == 401:
+    if response.status_code == 401:
         # 認証エラー
         print("❌ 401 Unauthorized：認証が必要です。")
         print("  - 環境変数 KABU_ID / KABU_PW がセットされているか確認してください。")
@@ -85,7 +91,12 @@ def download_csv(save_dir=SAVE_DIR, url=CSV_URL, use_basic_auth=True):
         print("  レスポンスヘッダ:", dict(response.headers))
         return None
 
-if __name__ == "__main__":
+def run():
     res = download_csv()
     if not res:
-        print("ダウンロード失敗。必要なら `use_basic_auth=False` で試すか、ログインセッション方式を使ってください。")
\ No newline at end of file
+        print("ダウンロード失敗。必要なら `use_basic_auth=False` で試すか、ログインセッション方式を使ってください。")
+    return res
+
+if __name__ == "__main__":
+    # 失敗時は終了コード1（main.py のスケジューラが後続ステージを止める）
+    sys.exit(0 if run() else 1)
\ No newline at end of file
@@ -1,61 +1,128 @@
 import os
 import pandas as pd
-import json
-import sys
-import gspread
-from google.oauth2.service_account import Credentials
+from gspread.utils import rowcol_to_a1
+from sheets_client import open_worksheet
+import log_store
+from keyed_merge import KeyIndex, key_columns_for
 
 # ==============================
 # Googleスプレッドシート設定
 # ==============================
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
-SERVICE_ACCOUNT_FILE = "credentials.json"
 SPREADSHEET_ID = "1CTRQdjsgFsRPgRdsT_c_rJheztivNAa1gyTKjxL-QR4"
 SECTOR_SHEET_NAME = "sector_log"
 MOMENTUM_SHEET_NAME = "momentum_log"
+MAX_ROWS = log_store.SHEET_MAX_ROWS
+
+# "delta": キー列だけ読み、新しい行だけ挿入（通常はこちら）
+# "rewrite": シート全体を読み直して書き換え（従来方式）
+UPLOAD_MODE = "delta"
 
 # ==============================
-# Google認証
+# Google認証（プロセス内で共通のクライアントを使用）
 # ==============================
-gcp_creds_env = os.environ.get("GCP_CREDENTIALS")
-if gcp_creds_env:
-    info = json.loads(gcp_creds_env)
-    creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    gc = gspread.authorize(creds)
-    sh = gc.open_by_key(SPREADSHEET_ID)
-else:
-    # 従来のファイル読み込み（ファイルがなければここで FileNotFoundError が出る）
-    creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    gc = gspread.authorize(creds)
-    sh = gc.open_by_key(SPREADSHEET_ID)
+def get_worksheet(sheet_name):
+    return open_worksheet(sheet_name, SPREADSHEET_ID)
 
 # ==============================
 # 共通アップロード関数（重複防止）
 # ==============================
-def upload_csv_to_sheet(csv_path, sheet_name, max_rows=19800):
-    print(f"Uploading {csv_path} → {sheet_name} ...")
-
-    # --- CSV読み込み ---
+def read_csv(csv_path):
     try:
-        df_new = pd.read_csv(csv_path, encoding="cp932")
+        return pd.read_csv(csv_path, encoding="cp932")
     except UnicodeDecodeError:
-        df_new = pd.read_csv(csv_path, encoding="utf-8-sig")
+        return pd.read_csv(csv_path, encoding="utf-8-sig")
+
+
+def upload_csv_to_sheet(csv_path, sheet_name, max_rows=MAX_ROWS, mode=UPLOAD_MODE):
+    print(f"Uploading {csv_path} → {sheet_name} ...")
+    df_new = read_csv(csv_path)
+    return upload_df_to_sheet(df_new, sheet_name, max_rows=max_rows, mode=mode)
 
-    header = list(df_new.columns)
 
+def upload_df_to_sheet(df_new, sheet_name, max_rows=MAX_ROWS, mode=UPLOAD_MODE):
+    """
+    DataFrame をシートの先頭（ヘッダー直下）に追加
+    戻り値: rewrite 時は書き込み後のシート全体（文字列の DataFrame、stage 5/6 にそのまま渡せる）
+            delta 時はシート全体を持たないため None（stage 5/6 がシートから読む）
+    """
     # --- 対象シート取得 ---
-    worksheet = sh.worksheet(sheet_name)
+    worksheet = get_worksheet(sheet_name)
+
+    if mode == "delta":
+        appended = append_new_rows(worksheet, df_new, sheet_name, max_rows)
+        if appended is not None:
+            return None
+        print(f"⚠️ {sheet_name}: ヘッダーが一致しないため全体を書き換えます")
+
+    return rewrite_sheet(worksheet, df_new, sheet_name, max_rows)
+
+
+# ==============================
+# 差分追加（キー列だけ読む）
+# ==============================
+def _column_range(col):
+    """2行目以降の1列分のレンジ（例: 2 → "B2:B"）"""
+    start = rowcol_to_a1(2, col)
+    return f"{start}:{start.rstrip('0123456789')}"
+
+
+def read_sheet_keys(worksheet, header):
+    """
+    ヘッダー行とキー列（日付・業種〔・時価総額帯〕）だけを1回の batch_get で取得
+    戻り値: (シートのヘッダー, キー列の DataFrame, データ行数)
+    """
+    key_cols = key_columns_for(header)
+    ranges = ["1:1"] + [_column_range(header.index(c) + 1) for c in key_cols]
+    header_range, *key_ranges = worksheet.batch_get(ranges)
+    sheet_header = header_range[0] if header_range else []
+
+    columns = [[row[0] if row else "" for row in values] for values in key_ranges]
+    n_rows = max(len(values) for values in columns)
+    columns = [values + [""] * (n_rows - len(values)) for values in columns]
+    return sheet_header, pd.DataFrame(dict(zip(key_cols, columns))), n_rows
+
+
+def append_new_rows(worksheet, df_new, sheet_name, max_rows=MAX_ROWS):
+    """
+    既存キーに無い行だけをヘッダー直下に挿入し、max_rows を超えた末尾（古い行）を削除
+    通信量は「キー列の読込＋新規行の書込」のみでシート全体の読み書きをしない
+    戻り値: 追加した行数（シートが空・ヘッダー不一致なら None → 全体書き換えへ）
+    """
+    header = list(df_new.columns)
+    sheet_header, existing_keys, n_existing = read_sheet_keys(worksheet, header)
+    if sheet_header != header:
+        return None
+
+    df_new_filtered = KeyIndex(existing_keys).new_rows(df_new)
+
+    if len(df_new_filtered):
+        worksheet.insert_rows(df_new_filtered.values.tolist(), row=2, value_input_option="RAW")
+
+    # 最大行数制限（ヘッダー込みで max_rows + 1 行まで）
+    total = n_existing + len(df_new_filtered)
+    if total > max_rows:
+        worksheet.delete_rows(max_rows + 2, total + 1)
+        total = max_rows
+
+    print(f"✅ {sheet_name}: {len(df_new_filtered)} 行を追加、合計 {total} 行になりました。（差分追加）")
+    return len(df_new_filtered)
+
+
+# ==============================
+# 全体書き換え（従来方式）
+# ==============================
+def rewrite_sheet(worksheet, df_new, sheet_name, max_rows=MAX_ROWS):
+    header = list(df_new.columns)
 
     # --- 既存データ取得 ---
     existing_data = worksheet.get_all_values()
     if existing_data:
         existing_df = pd.DataFrame(existing_data[1:], columns=existing_data[0])
 
-        # 日付と業種をキーに既存行をセット化
-        existing_keys = set(zip(existing_df["日付"], existing_df["業種"]))
-
-        # 新規データから既存キーを除外
-        df_new_filtered = df_new[~df_new.apply(lambda row: (row["日付"], row["業種"]) in existing_keys, axis=1)]
+        # 日付・業種〔・時価総額帯〕をキーに既存行を除外
+        df_new_filtered = KeyIndex(existing_df).new_rows(df_new)
+        # 列構成が変わった場合（窓設定の変更など）は既存行を新しいヘッダーの順に揃える（無い列は空欄）
+        existing_df = existing_df.reindex(columns=header, fill_value="")
     else:
         existing_df = pd.DataFrame(columns=header)
         df_new_filtered = df_new
@@ -73,25 +140,72 @@ def upload_csv_to_sheet(csv_path, sheet_name, max_rows=19800):
 
     print(f"✅ {sheet_name}: {len(df_new_filtered)} 行を追加、合計 {len(values)-1} 行に更新しました。")
 
+    # get_all_values() と同じく全て文字列で返す
+    return pd.DataFrame(values[1:], columns=values[0]).astype(str)
+
 
 # ==============================
 # メイン処理
 # ==============================
-if __name__ == "__main__":
+def latest_csv(base_dir):
+    return os.path.join(base_dir, sorted(os.listdir(base_dir))[-1])
+
+
+def seed_store_from_sheet(sheet_name):
+    """ローカルDBが空のとき（初回のみ）シートの既存ログを取り込む"""
+    if log_store.count_rows(sheet_name):
+        return
+    data = get_worksheet(sheet_name).get_all_values()
+    if len(data) < 2:
+        return
+    existing_df = log_store.normalize(sheet_name, pd.DataFrame(data[1:], columns=data[0]))
+    log_store.write_log(sheet_name, existing_df)
+    log_store.set_watermark(sheet_name, existing_df["日付"].max())
+    print(f"🗄 {sheet_name}: シートの既存 {len(existing_df)} 行をローカルDBに取り込みました。")
+
+
+def sync_log(df_new, sheet_name):
+    """
+    ローカルDB（正本）に保存してから、シートへ未反映の日付分だけを差分で送る
+    未反映 = ウォーターマーク（反映済みの最新日付）より後の行 ＋ 今回の行
+    """
+    seed_store_from_sheet(sheet_name)
+    log_store.write_log(sheet_name, df_new)
+
+    watermark = log_store.get_watermark(sheet_name)
+    pending = log_store.normalize(sheet_name, df_new)
+    if watermark is not None:
+        newer = log_store.read_log(sheet_name, after=watermark)
+        _, keys = log_store.LOGS[sheet_name]
+        # 今回の行は DB を経由しない値を優先（SQLite は -0.0 を 0.0 に丸めるため）
+        pending = pd.concat([newer, pending], ignore_index=True).drop_duplicates(keys, keep="last")
+        pending = pending.sort_values("日付", ascending=False, kind="stable", ignore_index=True)
+
+    result = upload_df_to_sheet(pending, sheet_name)
+    log_store.set_watermark(sheet_name, max(filter(None, [watermark, pending["日付"].max()])))
+    return result
+
+
+def run(sector_df=None, momentum_df=None):
+    """
+    sector_log / momentum_log をローカルDB（data/state/logs.sqlite）とシートに反映
+    sector_df / momentum_df: stage 3 の結果（省略時は processed_data の最新CSVを読む）
+    戻り値: (sector_log, momentum_log) 更新後のシート内容（delta モードでは None）
+    """
     base_sector_dir = "data/processed_data/sector_summary"
     base_momentum_dir = "data/processed_data/momentum_summary"
 
-    latest_sector_csv = sorted(os.listdir(base_sector_dir))[-1]
-    latest_momentum_csv = sorted(os.listdir(base_momentum_dir))[-1]
+    if sector_df is None:
+        sector_df = read_csv(latest_csv(base_sector_dir))
+    if momentum_df is None:
+        momentum_df = read_csv(latest_csv(base_momentum_dir))
+
+    sector_log = sync_log(sector_df, SECTOR_SHEET_NAME)
+    momentum_log = sync_log(momentum_df, MOMENTUM_SHEET_NAME)
 
-    upload_csv_to_sheet(
-        csv_path=os.path.join(base_sector_dir, latest_sector_csv),
-        sheet_name=SECTOR_SHEET_NAME
-    )
+    print("全シート更新完了！")
+    return sector_log, momentum_log
 
-    upload_csv_to_sheet(
-        csv_path=os.path.join(base_momentum_dir, latest_momentum_csv),
-        sheet_name=MOMENTUM_SHEET_NAME
-    )
 
-    print("全シート更新完了！")
\ No newline at end of file
+if __name__ == "__main__":
+    run()
@@ -1,15 +1,13 @@
 import os
 import pandas as pd
 import numpy as np
-import gspread
-from google.oauth2.service_account import Credentials
+from sheets_client import open_worksheet
+import log_store
 from industry_name_mapping import industry_name_mapping
 
 # ==============================
 # Googleスプレッドシート設定
 # ==============================
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
-SERVICE_ACCOUNT_FILE = "credentials.json"
 SPREADSHEET_ID = "1CTRQdjsgFsRPgRdsT_c_rJheztivNAa1gyTKjxL-QR4"
 
 SECTOR_LOG_SHEET = "sector_log"
@@ -34,30 +32,39 @@ SECTOR_ORDER = [
 ]
 
 # ==============================
-# Google認証
+# Google認証（プロセス内で共通のクライアントを使用）
 # ==============================
-creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-gc = gspread.authorize(creds)
-sh = gc.open_by_key(SPREADSHEET_ID)
+def get_worksheet(sheet_name):
+    return open_worksheet(sheet_name, SPREADSHEET_ID)
 
 # ==============================
 # 共通関数
 # ==============================
 def get_sheet_dataframe(sheet_name):
     """GoogleシートをDataFrameとして取得"""
-    worksheet = sh.worksheet(sheet_name)
+    worksheet = get_worksheet(sheet_name)
     data = worksheet.get_all_values()
     if not data:
         return pd.DataFrame()
     df = pd.DataFrame(data[1:], columns=data[0])
     return df
 
+def get_log_dataframe(sheet_name):
+    """
+    ローカルDB（stage 4 が保存）から直近 KEEP_DAYS 日分だけを取得
+    DB が未作成・空の場合のみシートから取得
+    """
+    df = log_store.read_log(sheet_name, max_dates=KEEP_DAYS)
+    if df.empty:
+        return get_sheet_dataframe(sheet_name)
+    return df
+
 def update_sheet(df, sheet_name):
     """
     GoogleシートにDataFrameをアップロード。
     [修正箇所] アップロード前に日付列を最新120日分にカットします。
     """
-    worksheet = sh.worksheet(sheet_name)
+    worksheet = get_worksheet(sheet_name)
     df = df.replace([np.inf, -np.inf], np.nan).fillna("")
     
     # 現状のデータフレームの列数
@@ -90,8 +97,9 @@ def update_sheet(df, sheet_name):
 # ==============================
 # sector_ranking 作成
 # ==============================
-def create_sector_ranking():
-    df = get_sheet_dataframe(SECTOR_LOG_SHEET)
+def create_sector_ranking(df=None):
+    """df: sector_log の内容（省略時はローカルDBから取得）"""
+    df = get_log_dataframe(SECTOR_LOG_SHEET) if df is None else df.copy()
     if df.empty:
         print("sector_log が空です")
         return
@@ -137,8 +145,9 @@ def create_sector_ranking():
 # ==============================
 # momentum_flow 作成
 # ==============================
-def create_momentum_flow():
-    df = get_sheet_dataframe(MOMENTUM_LOG_SHEET)
+def create_momentum_flow(df=None):
+    """df: momentum_log の内容（省略時はローカルDBから取得）"""
+    df = get_log_dataframe(MOMENTUM_LOG_SHEET) if df is None else df.copy()
     if df.empty:
         print("momentum_log が空です")
         return
@@ -198,7 +207,12 @@ def create_momentum_flow():
 # ==============================
 # メイン処理
 # ==============================
-if __name__ == "__main__":
-    create_sector_ranking()
-    create_momentum_flow()
+def run(sector_log=None, momentum_log=None):
+    """sector_log / momentum_log: stage 4 の結果（省略時はローカルDBから取得）"""
+    create_sector_ranking(sector_log)
+    create_momentum_flow(momentum_log)
     print("全シート更新完了！")
+
+
+if __name__ == "__main__":
+    run()
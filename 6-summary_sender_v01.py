@@ -1,14 +1,13 @@
-import gspread
 import pandas as pd
 import numpy as np
-import requests
-from google.oauth2.service_account import Credentials
+from sheets_client import open_worksheet
+import log_store
+import discord_notifier
+from rank_streaks import latest_streaks
 
 # ==============================
 # Googleスプレッドシート設定
 # ==============================
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
-SERVICE_ACCOUNT_FILE = "credentials.json"
 SPREADSHEET_ID = "1CTRQdjsgFsRPgRdsT_c_rJheztivNAa1gyTKjxL-QR4"
 
 SECTOR_LOG_SHEET = "sector_log"
@@ -25,66 +24,65 @@ SECTOR_ORDER = [
 ]
 
 # ==============================
-# Google認証
+# Google認証（プロセス内で共通のクライアントを使用）
 # ==============================
-creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-gc = gspread.authorize(creds)
-sh = gc.open_by_key(SPREADSHEET_ID)
+def get_worksheet(sheet_name):
+    return open_worksheet(sheet_name, SPREADSHEET_ID)
 
 # ==============================
 # DataFrame取得
 # ==============================
 def get_sheet_df(sheet_name):
-    ws = sh.worksheet(sheet_name)
+    ws = get_worksheet(sheet_name)
     data = ws.get_all_values()
     if not data:
         return pd.DataFrame()
     df = pd.DataFrame(data[1:], columns=data[0])
     return df
 
+def get_log_df(sheet_name):
+    """
+    ローカルDB（stage 4 が保存）から、シートと同じ保持行数分を新しい順に取得
+    DB が未作成・空の場合のみシートから取得
+    """
+    df = log_store.read_log(sheet_name, max_rows=log_store.SHEET_MAX_ROWS)
+    if df.empty:
+        return get_sheet_df(sheet_name)
+    return df
+
 # ==============================
 # 連続日数計算
 # ==============================
-def calc_consecutive_days(df, key_col, sort_col, top_n=True):
+def calc_consecutive_days(df, key_col, sort_col, top_n=True, n=5):
     """
-    df: 日付順にソート済み DataFrame
+    最新日時点で、各業種がその日の業種間順位で上位n位（top_n=False なら下位n位）以内に
+    何日連続で入っているかを返す
+    df: 日付・業種・指標列を含む DataFrame（順序は問わない）
     key_col: 業種列
     sort_col: 順位・比率列
-    top_n: Trueならトップn、Falseならボトムn
     """
-    df_sorted = df.sort_values("日付")  # 日付順
-    last_date = df_sorted["日付"].max()
-    consecutive = {}
-    for sector in df_sorted[key_col].unique():
-        sector_df = df_sorted[df_sorted[key_col]==sector].sort_values("日付")
-        count = 0
-        # 行を逆順に
-        for _, row in sector_df.iloc[::-1].iterrows():
-            if (top_n and row[sort_col] in sector_df[sort_col].nlargest(5).values) or \
-               (not top_n and row[sort_col] in sector_df[sort_col].nsmallest(5).values):
-                count += 1
-            else:
-                break
-        consecutive[sector] = count
-    return consecutive
+    return latest_streaks(df, sort_col, key_col=key_col, top_n=top_n, n=n)
 
 # ==============================
 # Discord送信
 # ==============================
 def send_discord(message):
-    requests.post(DISCORD_WEBHOOK, json={"content": message})
+    """送信を予約してすぐに戻る（2,000文字を超える場合は表の境目で分割、送信はバックグラウンド）"""
+    discord_notifier.notify(DISCORD_WEBHOOK, message)
 
 # ==============================
 # メイン処理
 # ==============================
-def main():
+def run(sector_log=None, momentum_log=None):
+    """sector_log / momentum_log: stage 4 の結果（省略時はローカルDBから取得）"""
     # ===== sector_log =====
-    sector_df = get_sheet_df(SECTOR_LOG_SHEET)
+    sector_df = get_log_df(SECTOR_LOG_SHEET) if sector_log is None else sector_log
     sector_df = sector_df[sector_df["時価総額帯"]=="全体"].copy()
 
     # 数値化
     for col in ["上昇銘柄数","下落銘柄数","時価総額加重平均騰落率"]:
-        sector_df[col] = pd.to_numeric(sector_df[col].str.replace(",",""), errors="coerce")
+        if sector_df[col].dtype == object:  # シート由来（文字列）の場合のみ
+            sector_df[col] = pd.to_numeric(sector_df[col].str.replace(",",""), errors="coerce")
 
     # 上昇率
     sector_df["上昇銘柄数率"] = sector_df["上昇銘柄数"] / (sector_df["上昇銘柄数"] + sector_df["下落銘柄数"])
@@ -102,7 +100,7 @@ def main():
     bottom5_days = calc_consecutive_days(sector_df, "業種", "時価総額加重平均騰落率", top_n=False)
 
     # ===== momentum_log =====
-    mom_df = get_sheet_df(MOMENTUM_LOG_SHEET)
+    mom_df = get_log_df(MOMENTUM_LOG_SHEET) if momentum_log is None else momentum_log.copy()
     for col in ["売買代金5日平均/20日平均比率", "売買代金3日平均/10日平均比率"]:
         mom_df[col] = pd.to_numeric(mom_df[col], errors="coerce")
     latest_mom = mom_df[mom_df["日付"]==latest_date]
@@ -150,10 +148,10 @@ def main():
 
     # ===== 送信 =====
     send_discord(msg)
-    print("✅ Discord送信完了")
+    print("✅ Discord送信を予約")
 
 # ==============================
 # 実行
 # ==============================
 if __name__=="__main__":
-    main()
\ No newline at end of file
+    run()
\ No newline at end of file
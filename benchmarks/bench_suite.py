@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+# stage 3 まわりのベンチマーク（合成データ 1× / 10× / 100×）＋ 実データでの出力一致チェック
+# 使用:
+#   python benchmarks/bench_suite.py                         ← 1×, 10×, 100×（各25営業日）を計測
+#   python benchmarks/bench_suite.py --scales 1 10 --days 40
+#   python benchmarks/bench_suite.py --golden-only           ← 出力一致チェックのみ
+#   python benchmarks/bench_suite.py --save-golden DIR       ← 実データから入力を切り出し、現在のコードの出力を正解として保存
+#
+# 出力一致チェック: --golden-dir（既定: benchmarks/golden・コミット済み）の raw/ を一時ディレクトリで
+# multi-process/data_multi_processor_v02.py（通常モード・--backfill）に通し、sector_summary /
+# momentum_summary が同じフォルダの正解 CSV とバイト単位で一致するかを確認する。
+# 正解データが無い・空の場合は失敗扱い（終了コード 1）。
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import subprocess
+import importlib.util
+import io
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synth_market import generate_market, BASE_TICKERS  # noqa: E402
+from raw_loader import load_stock_prices, load_index_data  # noqa: E402
+import monthly_archive  # noqa: E402
+from sector_summary import classify_market_cap, aggregate_sector, STOCK_INPUT_COLUMNS, INDEX_INPUT_COLUMNS  # noqa: E402
+from rank_streaks import latest_streaks  # noqa: E402
+
+MULTI_PROCESSOR = os.path.join(ROOT_DIR, "multi-process", "data_multi_processor_v02.py")
+OUTPUT_SUBDIRS = ["sector_summary", "momentum_summary"]
+RAW_SUBDIRS = ["japan_all_stock", "tosho_index"]
+GOLDEN_DIR = os.path.join(ROOT_DIR, "benchmarks", "golden")
+GOLDEN_DAYS = 22          # 正解データの営業日数（20日平均＋2日）
+GOLDEN_TICKER_STEP = 20   # 全銘柄株価は20銘柄に1銘柄だけ残す（約190銘柄・コミットできる大きさに）
+
+
+# ==============================
+# 共通
+# ==============================
+@contextlib.contextmanager
+def working_dir(path):
+    """相対パス（data/...）を使うモジュールを path の下で動かす"""
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+def timed(func, repeat=1):
+    """func を repeat 回実行し、最短時間（秒）と最後の戻り値を返す"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def load_script(relative_path):
+    path = os.path.join(ROOT_DIR, relative_path)
+    name = "bench_" + "".join(c if c.isalnum() else "_" for c in os.path.splitext(relative_path)[0])
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_multi_processor(work_dir, backfill=False):
+    """multi-process の一括処理を work_dir で実行（main.py と同じく PYTHONPATH にリポジトリを追加）"""
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    cmd = [sys.executable, MULTI_PROCESSOR] + (["--backfill"] if backfill else [])
+    subprocess.run(cmd, cwd=work_dir, env=env, check=True, stdout=subprocess.DEVNULL)
+
+
+def reset_outputs(work_dir):
+    """前回の集計結果・状態・キャッシュを消して、毎回同じ条件で計測"""
+    for sub in ["data/processed_data", "data/state", "data/cache"]:
+        shutil.rmtree(os.path.join(work_dir, sub), ignore_errors=True)
+
+
+# ==============================
+# 計測（1スケール分）
+# ==============================
+def aggregate_latest(stock_file, index_file, date_str):
+    stock_df = load_stock_prices(stock_file, columns=STOCK_INPUT_COLUMNS)
+    index_df = load_index_data(index_file, columns=INDEX_INPUT_COLUMNS)
+    stock_df["時価総額帯"] = classify_market_cap(stock_df["時価総額（百万円）"])
+    stock_df["上昇フラグ"] = stock_df["前日比"] > 0
+    stock_df["下落フラグ"] = stock_df["前日比"] <= 0
+    return aggregate_sector(stock_df, index_df, f"{date_str[:4]}/{date_str[4:6]}/{date_str[6:]}")
+
+
+def summary_streaks(sector_log, momentum_log):
+    """summary（stage 6）の連続日数計算 4 種"""
+    overall = sector_log[sector_log["時価総額帯"] == "全体"]
+    return [
+        latest_streaks(overall, "時価総額加重平均騰落率", top_n=True),
+        latest_streaks(overall, "時価総額加重平均騰落率", top_n=False),
+        latest_streaks(momentum_log, "売買代金5日平均/20日平均比率", top_n=True),
+        latest_streaks(momentum_log, "売買代金5日平均/20日平均比率", top_n=False),
+    ]
+
+
+def read_outputs(work_dir, sub_dir):
+    folder = os.path.join(work_dir, "data", "processed_data", sub_dir)
+    return pd.concat([pd.read_csv(os.path.join(folder, f), encoding="utf-8-sig") for f in sorted(os.listdir(folder))],
+                     ignore_index=True)
+
+
+def bench_scale(work_dir, scale, n_days, seed):
+    n_tickers = BASE_TICKERS * scale
+    results = []
+
+    def add(step, seconds, **extra):
+        results.append(dict(scale=f"{scale}x", tickers=n_tickers, days=n_days, step=step,
+                            seconds=round(seconds, 3), **extra))
+
+    elapsed, dates = timed(lambda: generate_market(work_dir, n_tickers, n_days, seed=seed))
+    add("generate", elapsed)
+
+    stage3 = load_script("3-data_processor_v01.py")
+    with working_dir(work_dir):
+        stock_files = sorted(p for p in stage3.raw_stock_dir.glob("japan-all-stock-prices_*.csv"))
+        index_files = sorted(p for p in stage3.raw_index_dir.glob("tosho-index-data_*.csv"))
+        date_str = dates[-1]
+
+        # --- 生CSV読込（キャッシュ無し → Parquet キャッシュ） ---
+        reset_outputs(work_dir)
+        add("load_stock_prices (CSV)", timed(lambda: load_stock_prices(stock_files[-1]))[0])
+        add("load_stock_prices (cache)", timed(lambda: load_stock_prices(stock_files[-1], columns=STOCK_INPUT_COLUMNS), 3)[0])
+
+        # --- sector_summary（読込済みキャッシュから集計） ---
+        add("aggregate_sector (1日)", timed(lambda: aggregate_latest(stock_files[-1], index_files[-1], date_str), 3)[0])
+
+        # --- momentum（状態なし＝20日分補完 → 状態あり＝当日分のみ） ---
+        shutil.rmtree("data/state", ignore_errors=True)
+        add("compute_momentum (状態なし)", timed(lambda: stage3.compute_momentum(stock_files, date_str))[0])
+        add("compute_momentum (状態あり)", timed(lambda: stage3.compute_momentum(stock_files, date_str), 3)[0])
+
+    # --- multi-process 一括処理（日次モード / --backfill） ---
+    reset_outputs(work_dir)
+    elapsed, _ = timed(lambda: run_multi_processor(work_dir))
+    add("multi processor", elapsed, days_per_sec=round(n_days / elapsed, 1))
+    reset_outputs(work_dir)
+    elapsed, _ = timed(lambda: run_multi_processor(work_dir, backfill=True))
+    add("multi processor --backfill", elapsed, days_per_sec=round(n_days / elapsed, 1))
+
+    # --- summary の連続日数（全期間） ---
+    sector_log = read_outputs(work_dir, "sector_summary")
+    momentum_log = read_outputs(work_dir, "momentum_summary")
+    add("summary streaks (4種)", timed(lambda: summary_streaks(sector_log, momentum_log), 3)[0])
+    return results
+
+
+# ==============================
+# 出力一致チェック（実データ）
+# ==============================
+def produce_outputs(work_dir, raw_dir, backfill):
+    """raw_dir（japan_all_stock / tosho_index）を work_dir/data/raw にコピーして一括処理"""
+    shutil.copytree(raw_dir, os.path.join(work_dir, "data", "raw"))
+    run_multi_processor(work_dir, backfill=backfill)
+    return os.path.join(work_dir, "data", "processed_data")
+
+
+def _read_bytes(path):
+    """ファイルの中身（月別アーカイブに移したものはアーカイブから）"""
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    return monthly_archive.open_member(path).read()
+
+
+def compare_outputs(produced_dir, golden_dir):
+    """サブフォルダごとに CSV をバイト単位で比較。戻り値: 不一致ファイルのリスト"""
+    mismatches = []
+    for sub in OUTPUT_SUBDIRS:
+        for name in sorted(os.listdir(os.path.join(golden_dir, sub))):
+            produced = os.path.join(produced_dir, sub, name)
+            if not os.path.exists(produced) or _read_bytes(produced) != _read_bytes(os.path.join(golden_dir, sub, name)):
+                mismatches.append(f"{sub}/{name}")
+    return mismatches
+
+
+def missing_golden(golden_dir):
+    """正解データ（入力の raw/ と出力）のうち、無い・空のフォルダ"""
+    subs = [os.path.join("raw", sub) for sub in RAW_SUBDIRS] + OUTPUT_SUBDIRS
+    return [sub for sub in subs
+            if not os.path.isdir(os.path.join(golden_dir, sub)) or not os.listdir(os.path.join(golden_dir, sub))]
+
+
+def golden_check(golden_dir):
+    missing = missing_golden(golden_dir)
+    if missing:
+        print(f"❌ 正解データがありません: {golden_dir}（{', '.join(missing)}）")
+        return False
+
+    ok = True
+    for backfill in (False, True):
+        label = "--backfill" if backfill else "通常モード"
+        with tempfile.TemporaryDirectory() as work_dir:
+            mismatches = compare_outputs(produce_outputs(work_dir, os.path.join(golden_dir, "raw"), backfill), golden_dir)
+        if mismatches:
+            ok = False
+            print(f"❌ 出力不一致（{label}）: {len(mismatches)} ファイル 例: {mismatches[:5]}")
+        else:
+            print(f"✅ 出力一致（{label}）: {golden_dir}")
+    return ok
+
+
+def _ticker_code(line):
+    return line.split(b",", 1)[0]
+
+
+def save_golden_inputs(raw_dir, n_days=GOLDEN_DAYS, step=GOLDEN_TICKER_STEP):
+    """
+    実データ（data/raw・月別アーカイブ）の先頭 n_days 営業日を切り出して raw_dir に保存
+    全銘柄株価は初日の step 行に1行の銘柄だけを全日で残す（日によって業種が欠けないように）
+    """
+    with working_dir(ROOT_DIR):
+        stock_files = monthly_archive.list_files("data/raw/japan_all_stock", "japan-all-stock-prices_*.csv")[:n_days]
+        index_files = {p.name[-12:]: p for p in monthly_archive.list_files("data/raw/tosho_index", "tosho-index-data_*.csv")}
+        codes = None
+        for stock_file in stock_files:
+            lines = _read_bytes(stock_file).splitlines(keepends=True)
+            if codes is None:
+                codes = {_ticker_code(line) for line in lines[1::step]}
+            stock_data = b"".join(lines[:1] + [line for line in lines[1:] if _ticker_code(line) in codes])
+            index_file = index_files[stock_file.name[-12:]]
+            for sub, path, data in [("japan_all_stock", stock_file, stock_data),
+                                    ("tosho_index", index_file, _read_bytes(index_file))]:
+                os.makedirs(os.path.join(raw_dir, sub), exist_ok=True)
+                with open(os.path.join(raw_dir, sub, path.name), "wb") as f:
+                    f.write(data)
+    print(f"✅ 入力を保存: {raw_dir}（{len(stock_files)} 営業日・{len(codes or ())} 銘柄）")
+
+
+def save_golden(golden_dir):
+    raw_dir = os.path.join(golden_dir, "raw")
+    if not os.path.isdir(raw_dir):
+        save_golden_inputs(raw_dir)
+    with tempfile.TemporaryDirectory() as work_dir:
+        produced_dir = produce_outputs(work_dir, raw_dir, backfill=False)
+        for sub in OUTPUT_SUBDIRS:
+            shutil.copytree(os.path.join(produced_dir, sub), os.path.join(golden_dir, sub), dirs_exist_ok=True)
+    print(f"✅ 正解データを保存: {golden_dir}")
+
+
+# ==============================
+# 表示
+# ==============================
+def print_results(results):
+    print(f"{'scale':>6} {'tickers':>9} {'days':>5}  {'step':<32} {'sec':>8}")
+    print("-" * 66)
+    for r in results:
+        extra = f"  ({r['days_per_sec']} 日/秒)" if "days_per_sec" in r else ""
+        print(f"{r['scale']:>6} {r['tickers']:>9,} {r['days']:>5}  {r['step']:<32} {r['seconds']:>8.3f}{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="stage 3 まわりのベンチマークと出力一致チェック")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="銘柄数の倍率（1× = 約3,800銘柄）")
+    parser.add_argument("--days", type=int, default=25, help="合成データの営業日数（20日平均に必要な20日以上）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="合成データの作成先（省略時は一時ディレクトリ・終了時に削除）")
+    parser.add_argument("--golden-dir", default=GOLDEN_DIR,
+                        help="出力一致チェックの正解（入力の raw/ と sector_summary / momentum_summary を含む）")
+    parser.add_argument("--golden-only", action="store_true", help="出力一致チェックのみ実行")
+    parser.add_argument("--skip-golden", action="store_true", help="出力一致チェックを省略")
+    parser.add_argument("--save-golden", metavar="DIR", help="現在のコードの出力を正解として DIR に保存して終了")
+    parser.add_argument("--json", help="計測結果を書き出す JSON ファイル")
+    args = parser.parse_args()
+
+    if args.save_golden:
+        save_golden(os.path.abspath(args.save_golden))
+        return
+
+    golden_ok = None
+    if not args.skip_golden:
+        golden_ok = golden_check(os.path.abspath(args.golden_dir))
+    if args.golden_only:
+        sys.exit(0 if golden_ok else 1)
+
+    results = []
+    for scale in args.scales:
+        print(f"⏳ {scale}×（{BASE_TICKERS * scale:,} 銘柄 × {args.days} 日）を計測中...")
+        if args.work_dir:
+            work_dir = os.path.abspath(os.path.join(args.work_dir, f"scale_{scale}x"))
+            shutil.rmtree(work_dir, ignore_errors=True)
+            os.makedirs(work_dir)
+            results += bench_scale(work_dir, scale, args.days, args.seed)
+        else:
+            with tempfile.TemporaryDirectory() as work_dir:
+                results += bench_scale(work_dir, scale, args.days, args.seed)
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"golden_ok": golden_ok, "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"✅ 結果を保存: {args.json}")
+    if golden_ok is False:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
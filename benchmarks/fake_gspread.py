@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+# Googleスプレッドシート（gspread）のオフライン代替
+# 各ステージが使う gspread の操作だけをメモリ上で再現し、API呼び出し回数・セル数・
+# 送受信バイト数を記録する。latency を指定すると1呼び出しごとにその秒数だけ待つ。
+import re
+import json
+import time
+from collections import Counter
+
+_sleep = time.sleep  # 計測対象スクリプト側で time.sleep を差し替えても影響を受けない
+
+
+# ==============================
+# 呼び出し記録
+# ==============================
+class ApiRecorder:
+    """API呼び出しの回数・セル数・バイト数を集計"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.reset()
+
+    def reset(self):
+        self.calls = Counter()
+        self.read_cells = 0
+        self.write_cells = 0
+        self.read_bytes = 0
+        self.write_bytes = 0
+
+    def record(self, method, read=None, write=None):
+        self.calls[method] += 1
+        if read is not None:
+            self.read_cells += _count_cells(read)
+            self.read_bytes += _payload_bytes(read)
+        if write is not None:
+            self.write_cells += _count_cells(write)
+            self.write_bytes += _payload_bytes(write)
+        if self.latency:
+            _sleep(self.latency)
+
+    def snapshot(self):
+        return {
+            "calls": sum(self.calls.values()),
+            "calls_by_method": dict(self.calls),
+            "read_cells": self.read_cells,
+            "write_cells": self.write_cells,
+            "read_bytes": self.read_bytes,
+            "write_bytes": self.write_bytes,
+        }
+
+
+def _count_cells(values):
+    return sum(len(row) for row in values)
+
+
+def _payload_bytes(values):
+    return len(json.dumps(values, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+# ==============================
+# A1表記
+# ==============================
+def _col_to_num(letters):
+    num = 0
+    for ch in letters:
+        num = num * 26 + ord(ch.upper()) - 64
+    return num
+
+
+def parse_a1_range(a1, n_rows, n_cols):
+    """
+    "B3:C10" / "A2:A" / "1:1" / "C5" を (開始行, 開始列, 終了行, 終了列) に変換（1始まり・両端含む）
+    終端の省略は現在のシートサイズまでとみなす
+    """
+    a1 = a1.split("!")[-1]
+    parts = a1.split(":")
+    bounds = []
+    for part in parts:
+        m = re.fullmatch(r"([A-Za-z]*)(\d*)", part)
+        letters, digits = m.groups()
+        bounds.append((int(digits) if digits else None, _col_to_num(letters) if letters else None))
+    (r1, c1), (r2, c2) = bounds[0], bounds[-1]
+    if len(parts) == 1:
+        return r1, c1, r1, c1
+    return r1 or 1, c1 or 1, r2 or max(n_rows, 1), c2 or max(n_cols, 1)
+
+
+def _to_cell(value):
+    """RAW 入力後にシートが返す文字列に近い形へ変換"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return ""
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+
+# ==============================
+# ワークシート
+# ==============================
+class FakeWorksheet:
+    def __init__(self, title, recorder, rows=None):
+        self.title = title
+        self._recorder = recorder
+        self._rows = [[_to_cell(v) for v in row] for row in (rows or [])]
+
+    # --- 内部処理（記録しない） ---
+    @property
+    def n_rows(self):
+        return len(self._rows)
+
+    @property
+    def n_cols(self):
+        return max((len(r) for r in self._rows), default=0)
+
+    def _trimmed(self):
+        rows = [list(r) for r in self._rows]
+        while rows and not any(rows[-1]):
+            rows.pop()
+        for row in rows:
+            while row and row[-1] == "":
+                row.pop()
+        return rows
+
+    def _put(self, r1, c1, values):
+        for i, row in enumerate(values):
+            r = r1 - 1 + i
+            while len(self._rows) <= r:
+                self._rows.append([])
+            target = self._rows[r]
+            for j, v in enumerate(row):
+                c = c1 - 1 + j
+                if len(target) <= c:
+                    target.extend([""] * (c + 1 - len(target)))
+                target[c] = _to_cell(v)
+
+    def _get(self, a1):
+        r1, c1, r2, c2 = parse_a1_range(a1, self.n_rows, self.n_cols)
+        out = []
+        for r in range(r1 - 1, min(r2, self.n_rows)):
+            row = self._rows[r][c1 - 1:c2]
+            while row and row[-1] == "":
+                row.pop()
+            out.append(row)
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def peek(self):
+        """記録せずに中身を確認（ベンチマークの検証用）"""
+        return self._trimmed()
+
+    # --- gspread 互換 API ---
+    def get_all_values(self, **kwargs):
+        values = self._trimmed()
+        self._recorder.record("get_all_values", read=values)
+        return values
+
+    def row_values(self, row, **kwargs):
+        values = self._trimmed()
+        result = values[row - 1] if row <= len(values) else []
+        self._recorder.record("row_values", read=[result])
+        return list(result)
+
+    def col_values(self, col, **kwargs):
+        result = [r[col - 1] if len(r) >= col else "" for r in self._trimmed()]
+        while result and result[-1] == "":
+            result.pop()
+        self._recorder.record("col_values", read=[result])
+        return result
+
+    def batch_get(self, ranges, **kwargs):
+        results = [self._get(a1) for a1 in ranges]
+        self._recorder.record("batch_get", read=[row for values in results for row in values])
+        return results
+
+    def clear(self):
+        self._rows = []
+        self._recorder.record("clear")
+
+    def update(self, *args, **kwargs):
+        """update(values, range_name=None) と旧形式 update(range_name, values) の両方に対応"""
+        range_name = kwargs.get("range_name")
+        values = kwargs.get("values")
+        if args and isinstance(args[0], str):
+            range_name = args[0]
+            if len(args) > 1:
+                values = args[1]
+        elif args:
+            values = args[0]
+            if len(args) > 1:
+                range_name = args[1]
+        r1, c1 = 1, 1
+        if range_name:
+            r1, c1, _, _ = parse_a1_range(range_name, self.n_rows, self.n_cols)
+        self._put(r1, c1, values)
+        self._recorder.record("update", write=values)
+
+    def update_cell(self, row, col, value):
+        self._put(row, col, [[value]])
+        self._recorder.record("update_cell", write=[[value]])
+
+    def batch_update(self, data, **kwargs):
+        written = []
+        for item in data:
+            r1, c1, _, _ = parse_a1_range(item["range"], self.n_rows, self.n_cols)
+            self._put(r1, c1, item["values"])
+            written.extend(item["values"])
+        self._recorder.record("batch_update", write=written)
+
+    def insert_rows(self, values, row=1, **kwargs):
+        self._rows[row - 1:row - 1] = [[_to_cell(v) for v in r] for r in values]
+        self._recorder.record("insert_rows", write=values)
+
+    def delete_rows(self, start_index, end_index=None):
+        end_index = start_index if end_index is None else end_index
+        del self._rows[start_index - 1:end_index]
+        self._recorder.record("delete_rows")
+
+
+# ==============================
+# スプレッドシート・クライアント
+# ==============================
+class WorksheetNotFound(Exception):
+    pass
+
+
+class FakeSpreadsheet:
+    def __init__(self, recorder=None, auto_create=True):
+        self.recorder = recorder or ApiRecorder()
+        self.auto_create = auto_create
+        self._worksheets = {}
+
+    def add_worksheet(self, title, rows=None, **kwargs):
+        ws = FakeWorksheet(title, self.recorder, rows)
+        self._worksheets[title] = ws
+        return ws
+
+    def worksheet(self, title):
+        if title not in self._worksheets:
+            if not self.auto_create:
+                raise WorksheetNotFound(title)
+            self.add_worksheet(title)
+        self.recorder.record("worksheet")
+        return self._worksheets[title]
+
+    def worksheets(self):
+        return list(self._worksheets.values())
+
+
+class FakeClient:
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def open_by_key(self, key):
+        self.spreadsheet.recorder.record("open_by_key")
+        return self.spreadsheet
+
+
+# ==============================
+# 差し替え
+# ==============================
+def install(spreadsheet, spreadsheet_ids=()):
+    """
+    実際の認証・通信の代わりに spreadsheet を返すよう差し替える
+    - sheets_client（stage 4〜6・multi-process）: クライアント・スプレッドシート・ワークシートのキャッシュ
+    - gspread.authorize / Credentials（念のため実際の認証も無効化）
+    """
+    import gspread
+    import sheets_client
+    from google.oauth2.service_account import Credentials
+
+    client = FakeClient(spreadsheet)
+    sheets_client._client = client
+    sheets_client._spreadsheets.clear()
+    sheets_client._worksheets.clear()
+    for spreadsheet_id in spreadsheet_ids or (sheets_client.SPREADSHEET_ID,):
+        sheets_client._spreadsheets[spreadsheet_id] = spreadsheet
+
+    gspread.authorize = lambda *args, **kwargs: client
+    Credentials.from_service_account_file = staticmethod(lambda *args, **kwargs: None)
+    return client
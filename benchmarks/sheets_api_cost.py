@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# Sheets を使うステージの API コスト計測（オフライン）
+# 使用:
+#   python benchmarks/sheets_api_cost.py                  ← data/processed_data の履歴で計測
+#   python benchmarks/sheets_api_cost.py --latency 0.2    ← 1呼び出し 0.2 秒の遅延を入れて所要時間も比較
+#   python benchmarks/sheets_api_cost.py --json out.json  ← 結果を JSON で保存
+#
+# 履歴（sector_summary / momentum_summary の日次CSV）の最終日を「当日」とし、
+# 前日までをシートに入れた状態から各ステージを1回ずつ実行して、
+# 呼び出し回数・読み書きセル数・バイト数・所要時間を表示する。
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import importlib.util
+import io
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_gspread  # noqa: E402
+
+SHEET_MAX_ROWS = 19800
+SECTOR_DIR = os.path.join("data", "processed_data", "sector_summary")
+MOMENTUM_DIR = os.path.join("data", "processed_data", "momentum_summary")
+
+
+# ==============================
+# 準備
+# ==============================
+def load_script(relative_path):
+    """ステージスクリプトをモジュールとして読み込む（ファイル名に '-' を含むため importlib を使用）"""
+    path = os.path.join(ROOT_DIR, relative_path)
+    name = "bench_" + "".join(c if c.isalnum() else "_" for c in os.path.splitext(relative_path)[0])
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def read_history(history_dir, sub_dir):
+    files = sorted(f for f in os.listdir(os.path.join(history_dir, sub_dir)) if f.endswith(".csv"))
+    return [pd.read_csv(os.path.join(history_dir, sub_dir, f), encoding="utf-8-sig") for f in files]
+
+
+def log_rows(days):
+    """日次 DataFrame のリスト（古い順）→ シートと同じ「ヘッダー＋新しい日付が上」の2次元リスト"""
+    if not days:
+        return []
+    df = pd.concat(days[::-1], ignore_index=True).head(SHEET_MAX_ROWS)
+    return [list(df.columns)] + df.values.tolist()
+
+
+def seeded_spreadsheet(sector_days, momentum_days, latency):
+    sh = fake_gspread.FakeSpreadsheet(fake_gspread.ApiRecorder(latency))
+    sh.add_worksheet("sector_log", log_rows(sector_days))
+    sh.add_worksheet("momentum_log", log_rows(momentum_days))
+    return sh
+
+
+@contextlib.contextmanager
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def measure(sh, label, func, results):
+    """func を1回実行し、その間の API コストを results に追加"""
+    sh.recorder.reset()
+    start = time.perf_counter()
+    with quiet():
+        func()
+    result = {"stage": label, "seconds": round(time.perf_counter() - start, 3)}
+    result.update(sh.recorder.snapshot())
+    results.append(result)
+
+
+# ==============================
+# シナリオ
+# ==============================
+def bench_daily(sector_days, momentum_days, latency, results):
+    """日次パイプライン（stage 4 → 5 → 6）"""
+    stage4 = load_script("4-google_sheets_uploader_v02.py")
+    stage5 = load_script("5-momentum_analyzer_v03.py")
+    stage6 = load_script("6-summary_sender_v01.py")
+    stage6.send_discord = lambda message: None  # Discord には送らない
+
+    # 前々日までをシートに入れ、前日分で1回流してローカルDBを作っておく（通常運用の状態）
+    sh = seeded_spreadsheet(sector_days[:-2], momentum_days[:-2], latency)
+    fake_gspread.install(sh)
+    with quiet():
+        stage4.run(sector_days[-2], momentum_days[-2])
+
+    measure(sh, "4-google_sheets_uploader", lambda: stage4.run(sector_days[-1], momentum_days[-1]), results)
+    measure(sh, "5-momentum_analyzer", stage5.run, results)
+    measure(sh, "6-summary_sender", stage6.run, results)
+
+
+def bench_multi(sector_days, momentum_days, latency, results):
+    """multi-process の一括アップロード・N日分追記"""
+    sh = seeded_spreadsheet(sector_days[:-5], momentum_days[:-5], latency)
+    fake_gspread.install(sh)
+
+    uploader = load_script(os.path.join("multi-process", "google_sheets_multi-uploader_v01.py"))
+    measure(sh, "multi-uploader (sector_log)",
+            lambda: uploader.upload_csvs_to_sheet(SECTOR_DIR, "sector_log", ["日付", "業種", "時価総額帯"]), results)
+    measure(sh, "multi-uploader (momentum_log)",
+            lambda: uploader.upload_csvs_to_sheet(MOMENTUM_DIR, "momentum_log", ["日付", "業種"]), results)
+
+    analyzer = load_script(os.path.join("multi-process", "momentum_multi_analyzer_v01.py"))
+    measure(sh, "multi-analyzer (20日分)", lambda: (analyzer.append_sector_ranking_Ndays(20),
+                                                    analyzer.append_momentum_flow_Ndays(20)), results)
+
+
+# ==============================
+# 表示
+# ==============================
+def print_results(results):
+    print(f"{'stage':<32} {'calls':>6} {'read cells':>11} {'write cells':>12} {'read KB':>9} {'write KB':>9} {'sec':>7}")
+    print("-" * 92)
+    for r in results:
+        print(f"{r['stage']:<32} {r['calls']:>6} {r['read_cells']:>11,} {r['write_cells']:>12,} "
+              f"{r['read_bytes'] / 1024:>9,.1f} {r['write_bytes'] / 1024:>9,.1f} {r['seconds']:>7.2f}")
+        print(f"{'':<32} {r['calls_by_method']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sheets を使うステージの API コスト計測（オフライン）")
+    parser.add_argument("--history-dir", default=os.path.join(ROOT_DIR, "data", "processed_data"),
+                        help="sector_summary / momentum_summary を含むディレクトリ")
+    parser.add_argument("--latency", type=float, default=0.0, help="1呼び出しあたりの擬似遅延（秒）")
+    parser.add_argument("--json", help="結果を書き出す JSON ファイル")
+    args = parser.parse_args()
+
+    history_dir = os.path.abspath(args.history_dir)
+    sector_days = read_history(history_dir, "sector_summary")
+    momentum_days = read_history(history_dir, "momentum_summary")
+    if len(sector_days) < 6 or len(momentum_days) < 6:
+        print("❌ 履歴が6日分以上必要です（multi-process/data_multi_processor_v02.py で作成してください）")
+        sys.exit(1)
+
+    # ローカルDB（data/state）などを汚さないよう一時ディレクトリで実行
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.makedirs(os.path.join(work_dir, "data"))
+        os.symlink(history_dir, os.path.join(work_dir, "data", "processed_data"))
+        cwd = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            bench_daily(sector_days, momentum_days, args.latency, results)
+            bench_multi(sector_days, momentum_days, args.latency, results)
+        finally:
+            os.chdir(cwd)
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"✅ 結果を保存: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# kabu.plus 形式の合成データ生成（ベンチマーク用）
+# 使用:
+#   python benchmarks/synth_market.py --out /tmp/synth --tickers 38000 --days 25
+#   → /tmp/synth/data/raw/japan_all_stock/japan-all-stock-prices_YYYYMMDD.csv
+#     /tmp/synth/data/raw/tosho_index/tosho-index-data_YYYYMMDD.csv（cp932・全項目ダブルクォート・CRLF）
+import os
+import sys
+import csv
+import argparse
+import datetime
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from industry_name_mapping import industry_name_mapping  # noqa: E402
+from market_calendar import business_days  # noqa: E402
+
+# ==============================
+# 設定
+# ==============================
+BASE_TICKERS = 3800  # 実データ（全銘柄株価一覧）とほぼ同じ銘柄数を 1× とする
+
+# 実データの業種別銘柄数（構成比として使用）
+SECTOR_WEIGHTS = {
+    "情報通信": 608, "サービス": 546, "小売": 331, "卸売": 292, "電気機器": 230, "機械": 215,
+    "化学": 207, "建設": 144, "不動産": 132, "食料品": 123, "その他製品": 107, "輸送用機器": 87,
+    "金属製品": 86, "銀行": 81, "医薬品": 80, "陸運": 57, "精密機器": 52, "ガラス土石": 51,
+    "繊維製品": 49, "その他金融": 39, "鉄鋼": 39, "証券・先物": 37, "非鉄金属": 33, "倉庫・運輸": 31,
+    "電気・ガス": 29, "パルプ・紙": 24, "ゴム製品": 18, "保険": 14, "水産・農林": 12, "海運": 11,
+    "石油・石炭": 10, "鉱業": 5, "空運": 5,
+}
+MARKETS = ["東証PR", "東証ST", "東証GR"]
+MARKET_WEIGHTS = [0.42, 0.42, 0.16]
+NO_TRADE_RATE = 0.01  # 売買が成立しない銘柄の割合（株価・出来高などが「-」）
+
+STOCK_HEADER = ["SC", "名称", "市場", "業種", "日付", "株価", "前日比", "前日比（％）", "前日終値",
+                "始値", "高値", "安値", "出来高", "売買代金（千円）", "時価総額（百万円）", "値幅下限", "値幅上限"]
+INDEX_HEADER = ["SC", "指数名", "日付", "終値", "前日比", "前日比（％）", "前日終値",
+                "時価総額（指数用・浮動株ベース）", "時価総額前日比", "前日時価総額", "平均時価総額",
+                "基準時価総額", "銘柄数", "売買単位換算後株式数"]
+# 先頭の株価指数行（全銘柄株価一覧に含まれ、集計時に除外される）
+INDEX_ROWS_IN_STOCK = [("0001", "日経平均株価（日経225）"), ("0002", "TOPIX（東証株価指数）")]
+
+
+# ==============================
+# 銘柄マスタ
+# ==============================
+def make_universe(n_tickers, rng):
+    sectors = list(SECTOR_WEIGHTS)
+    weights = np.array([SECTOR_WEIGHTS[s] for s in sectors], dtype=float)
+    sector_idx = rng.choice(len(sectors), size=n_tickers, p=weights / weights.sum())
+    market_cap = np.exp(rng.normal(np.log(30_000), 1.6, n_tickers)).clip(300, 5_000_000)  # 百万円
+    price = np.exp(rng.normal(np.log(1_500), 0.9, n_tickers)).clip(50, 80_000).round()
+    return pd.DataFrame({
+        "SC": [f"{1300 + i:04d}" for i in range(n_tickers)],
+        "名称": [f"合成銘柄{i}" for i in range(n_tickers)],
+        "市場": np.asarray(MARKETS, dtype=object)[rng.choice(3, size=n_tickers, p=MARKET_WEIGHTS)],
+        "業種": np.asarray(sectors, dtype=object)[sector_idx],
+        "sector_idx": sector_idx,
+        "shares": market_cap * 1_000_000 / price,
+        "price": price,
+    })
+
+
+# ==============================
+# 1日分の生成
+# ==============================
+def _fmt(values, decimals=0):
+    values = np.round(values, decimals)
+    if decimals == 0:
+        return values.astype(np.int64).astype(str)
+    return pd.Series(values).map(lambda v: f"{v:.{decimals}f}".rstrip("0").rstrip(".")).to_numpy()
+
+
+def simulate_day(universe, date_str, rng):
+    """universe の株価を1日進め、全銘柄株価一覧と業種別の騰落率を返す"""
+    n = len(universe)
+    n_sectors = len(SECTOR_WEIGHTS)
+    market_ret = rng.normal(0.0003, 0.01)
+    sector_ret = rng.normal(0, 0.008, n_sectors)
+    ret = market_ret + sector_ret[universe["sector_idx"].to_numpy()] + rng.normal(0, 0.02, n)
+
+    prev = universe["price"].to_numpy()
+    price = np.maximum(1, np.round(prev * (1 + ret)))
+    change = price - prev
+    change_pct = np.round(change / prev * 100, 2)
+    market_cap = np.round(price * universe["shares"].to_numpy() / 1_000_000)
+    turnover = market_cap * 1_000 * np.exp(rng.normal(np.log(0.003), 1.0, n))  # 千円
+    volume = np.maximum(100, np.round(turnover * 1_000 / price / 100) * 100)
+    traded = rng.random(n) >= NO_TRADE_RATE
+
+    high = np.maximum(price, prev) * (1 + np.abs(rng.normal(0, 0.005, n)))
+    low = np.minimum(price, prev) * (1 - np.abs(rng.normal(0, 0.005, n)))
+    open_ = np.clip(prev * (1 + rng.normal(0, 0.005, n)), low, high)
+
+    dash = np.full(n, "-", dtype=object)
+    stock = pd.DataFrame({
+        "SC": universe["SC"], "名称": universe["名称"], "市場": universe["市場"], "業種": universe["業種"],
+        "日付": date_str,
+        "株価": np.where(traded, _fmt(price), dash),
+        "前日比": np.where(traded, _fmt(change), "0"),
+        "前日比（％）": np.where(traded, _fmt(change_pct, 2), "0"),
+        "前日終値": _fmt(prev),
+        "始値": np.where(traded, _fmt(open_), dash),
+        "高値": np.where(traded, _fmt(high), dash),
+        "安値": np.where(traded, _fmt(low), dash),
+        "出来高": np.where(traded, _fmt(volume), dash),
+        "売買代金（千円）": np.where(traded, _fmt(price * volume / 1_000), dash),
+        "時価総額（百万円）": _fmt(market_cap),
+        "値幅下限": _fmt(prev * 0.8),
+        "値幅上限": _fmt(prev * 1.2),
+    })
+    index_rows = pd.DataFrame(
+        [[sc, name, "東証", "株価指数", date_str, "1000", "0", "0", "1000", "1000", "1000", "1000"] + ["-"] * 5
+         for sc, name in INDEX_ROWS_IN_STOCK],
+        columns=STOCK_HEADER,
+    )
+    stock = pd.concat([index_rows, stock], ignore_index=True)
+
+    # 売買不成立の銘柄は株価を据え置き
+    universe["price"] = np.where(traded, price, prev)
+
+    # 業種別の時価総額加重騰落率（東証業種別指数の代わり）
+    weights = pd.Series(market_cap * traded)
+    sector_pct = (pd.Series(change_pct * weights).groupby(universe["業種"].to_numpy()).sum()
+                  / weights.groupby(universe["業種"].to_numpy()).sum().clip(lower=1))
+    return stock, sector_pct.round(2), round(market_ret * 100, 2)
+
+
+def make_index_data(date_str, sector_pct, market_pct, levels):
+    """東証指数データ（TOPIX・規模別 + 33業種）"""
+    names = ["TOPIX", "大型", "中型", "小型"] + [industry_name_mapping[s] for s in SECTOR_WEIGHTS]
+    pcts = [market_pct] * 4 + [float(sector_pct.get(s, 0.0)) for s in SECTOR_WEIGHTS]
+    rows = []
+    for i, (name, pct) in enumerate(zip(names, pcts)):
+        prev = levels.get(name, 1000.0)
+        close = round(prev * (1 + pct / 100), 2)
+        levels[name] = close
+        rows.append([f"{i:04X}", name, date_str, f"{close}", f"{round(close - prev, 2)}", f"{pct}", f"{prev}",
+                     "0", "0", "0", "0", "0", "-", "0"])
+    return pd.DataFrame(rows, columns=INDEX_HEADER)
+
+
+def _write_csv(df, path):
+    tmp_path = path + ".part"
+    df.to_csv(tmp_path, index=False, encoding="cp932", quoting=csv.QUOTE_ALL, lineterminator="\r\n")
+    os.replace(tmp_path, path)
+
+
+# ==============================
+# 生成
+# ==============================
+def generate_market(out_dir, n_tickers=BASE_TICKERS, n_days=148, end_date=datetime.date(2025, 12, 25), seed=0):
+    """
+    out_dir/data/raw 以下に n_days 営業日分の全銘柄株価一覧・東証指数データを作成
+    同じ引数（seed）なら同じ内容になる
+    戻り値: 作成した日付（YYYYMMDD）のリスト
+    """
+    rng = np.random.default_rng(seed)
+    stock_dir = os.path.join(out_dir, "data", "raw", "japan_all_stock")
+    index_dir = os.path.join(out_dir, "data", "raw", "tosho_index")
+    os.makedirs(stock_dir, exist_ok=True)
+    os.makedirs(index_dir, exist_ok=True)
+
+    universe = make_universe(n_tickers, rng)
+    levels = {}
+    dates = []
+    for day in business_days(end_date, n_days):
+        date_str = day.strftime("%Y%m%d")
+        stock, sector_pct, market_pct = simulate_day(universe, date_str, rng)
+        _write_csv(stock, os.path.join(stock_dir, f"japan-all-stock-prices_{date_str}.csv"))
+        _write_csv(make_index_data(date_str, sector_pct, market_pct, levels),
+                   os.path.join(index_dir, f"tosho-index-data_{date_str}.csv"))
+        dates.append(date_str)
+    return dates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="kabu.plus 形式の合成データを生成")
+    parser.add_argument("--out", required=True, help="出力先（この下に data/raw を作成）")
+    parser.add_argument("--tickers", type=int, default=BASE_TICKERS, help="銘柄数")
+    parser.add_argument("--days", type=int, default=148, help="営業日数")
+    parser.add_argument("--end", default="2025-12-25", help="最終日（YYYY-MM-DD）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    end = datetime.datetime.strptime(args.end, "%Y-%m-%d").date()
+    dates = generate_market(args.out, args.tickers, args.days, end, args.seed)
+    print(f"✅ {len(dates)} 日分（{dates[0]}〜{dates[-1]}、{args.tickers:,} 銘柄）を作成 → {args.out}")
@@ -1,40 +1,93 @@
 import os
-import time
-from datetime import datetime, timedelta
+from pathlib import Path
+from datetime import date, datetime, timedelta
+from monthly_archive import ARCHIVE_DIR, file_date, archive_files
 
-def cleanup_old_files(base_dir, days_to_keep):
+# ==============================
+# 保持ルール：(フォルダ, 保持日数, 期限切れの扱い)
+# ==============================
+# 日付はファイル名（YYYYMMDD / YYYY-MM-DD）で判定する
+# （更新日時は clone・コピー・再ダウンロードで変わるため使わない）
+# - "archive": CSV は月別の .zip（data/archive）に移す → raw_loader はアーカイブからも読める
+#              .zip はコミットされるため、月の全日が期限切れになってから1回でまとめて作る
+#              （それまでは期限切れでもそのまま残す）。CSV 以外（.meta.json など）は削除
+# - "delete" : 削除（キャッシュ・ログなど作り直せるもの）
+RETENTION_RULES = [
+    ("data/raw", 30, "archive"),
+    ("data/processed_data", 30, "archive"),
+    ("data/cache", 30, "delete"),
+    ("logs", 10, "delete"),
+]
+ARCHIVE_SUFFIXES = (".csv",)
+
+
+def cutoff_date(days_to_keep, today=None):
+    """この日付より前が期限切れ"""
+    return (today or date.today()) - timedelta(days=days_to_keep)
+
+
+def month_closed(day, cutoff):
+    """day の月の全日が期限切れか（＝翌月1日が cutoff 以前）"""
+    next_month = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return next_month <= cutoff
+
+
+def find_expired_files(base_dir, days_to_keep, today=None):
     """
-    指定日数より古いファイルを削除する関数
+    ファイル名の日付が保持日数より古いファイルの一覧（サブフォルダも含む）
+    日付の無いファイル・アーカイブ置き場は対象外
     """
-    now = time.time()
-    cutoff = now - (days_to_keep * 86400)
-
-    for root, _, files in os.walk(base_dir):
-        for file in files:
-            file_path = os.path.join(root, file)
-            if os.path.isfile(file_path):
-                if os.path.getmtime(file_path) < cutoff:
-                    os.remove(file_path)
-                    print(f"[削除] {file_path}")
-
-def run_cleanup():
+    cutoff = cutoff_date(days_to_keep, today)
+    archive_root = os.path.abspath(ARCHIVE_DIR)
+    expired = []
+    stack = [base_dir]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if os.path.abspath(entry.path) != archive_root:
+                        stack.append(entry.path)
+                elif entry.is_file():
+                    file_day = file_date(entry.name)
+                    if file_day is not None and file_day < cutoff:
+                        expired.append(Path(entry.path))
+    return sorted(expired)
+
+
+def cleanup_old_files(base_dir, days_to_keep, action="delete", today=None):
+    """
+    期限切れのファイルをアーカイブ・削除
+    戻り値: (アーカイブ数, 削除数)
+    """
+    cutoff = cutoff_date(days_to_keep, today)
+    expired = find_expired_files(base_dir, days_to_keep, today)
+    to_archive = []
+    removed = 0
+    for path in expired:
+        if action == "archive" and path.name.endswith(ARCHIVE_SUFFIXES):
+            if month_closed(file_date(path.name), cutoff):
+                to_archive.append(path)
+        else:
+            path.unlink()
+            removed += 1
+            print(f"[削除] {path}")
+    archived = archive_files(to_archive) if to_archive else 0
+    return archived, removed
+
+
+def run_cleanup(today=None, rules=RETENTION_RULES):
     """
-    各フォルダごとに削除条件を設定
+    各フォルダごとの保持ルールを適用
     """
-    base_dirs = {
-        "data/raw": 30,       # 30日より古いデータを削除
-        "data/processed": 30, # 同上
-        "logs": 10            # 10日より古いログを削除
-    }
-
-    print(f"\n=== 古いデータ削除開始 ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')}) ===")
-    for path, days in base_dirs.items():
+    print(f"\n=== 古いデータ整理開始 ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')}) ===")
+    for path, days, action in rules:
         if os.path.exists(path):
-            cleanup_old_files(path, days)
+            archived, removed = cleanup_old_files(path, days, action, today)
+            print(f"[{path}] {days}日より前：アーカイブ {archived} 件・削除 {removed} 件")
         else:
             print(f"[スキップ] フォルダが存在しません: {path}")
-    print("=== 古いデータ削除完了 ===\n")
+    print("=== 古いデータ整理完了 ===\n")
 
 
 if __name__ == "__main__":
-    run_cleanup()
\ No newline at end of file
+    run_cleanup()
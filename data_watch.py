@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+import os
+import csv
+import time
+import datetime
+import email.utils
+import requests
+from urllib3.util.retry import Retry
+from requests.adapters import HTTPAdapter
+from http_download import conditional_headers
+
+# ==============================
+# 設定
+# ==============================
+# 監視するデータ（名前, 最新版の URL）※ stage 1・2 が取得する URL と同じ
+DATASETS = [
+    ("japan-all-stock-prices",
+     "https://csvex.com/kabu.plus/csv/japan-all-stock-prices/daily/japan-all-stock-prices.csv"),
+    ("tosho-index-data",
+     "https://csvex.com/kabu.plus/csv/tosho-index-data/daily/tosho-index-data.csv"),
+]
+JST = datetime.timezone(datetime.timedelta(hours=9))
+WATCH_START = os.environ.get("WATCH_START", "15:30")        # 監視を始める時刻（JST）
+WATCH_DEADLINE = os.environ.get("WATCH_DEADLINE", "20:00")  # この時刻までに揃わなければ打ち切り（JST）
+POLL_MIN = 10      # 秒：監視開始直後・更新を検知した直後の間隔
+POLL_MAX = 60      # 秒：変化が無い間は POLL_BACKOFF 倍ずつ延ばし、ここで頭打ち
+POLL_BACKOFF = 1.5
+PEEK_BYTES = 8192  # 日付の確認に読む先頭バイト数（ヘッダー＋1行目）
+TIMEOUT = 20       # 秒
+
+
+def get_credentials_from_env():
+    id_ = os.environ.get("KABU_ID")
+    pw = os.environ.get("KABU_PW")
+    return id_, pw
+
+
+def make_session():
+    s = requests.Session()
+    retries = Retry(total=2, backoff_factor=0.5,
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=["HEAD", "GET"])
+    s.mount("https://", HTTPAdapter(max_retries=retries))
+    s.headers.update({
+        "User-Agent": "momentum-watcher/1.0 (+https://yourdomain.example)"
+    })
+    return s
+
+
+def now_jst():
+    return datetime.datetime.now(JST)
+
+
+def at_time(day, hhmm):
+    """day の HH:MM（JST）"""
+    hour, minute = map(int, hhmm.split(":"))
+    return datetime.datetime.combine(day, datetime.time(hour, minute), tzinfo=JST)
+
+
+# ==============================
+# 1データの鮮度確認
+# ==============================
+def peek_date(session, url, auth=None, timeout=TIMEOUT):
+    """
+    CSV の先頭（ヘッダー＋1行目）だけを取得して「日付」列の値を返す（YYYYMMDD）
+    Range 指定で先頭だけ要求し、サーバーが無視した場合も PEEK_BYTES を読んだ時点で切断する
+    """
+    res = session.get(url, auth=auth, timeout=timeout, stream=True,
+                      headers={"Range": f"bytes=0-{PEEK_BYTES - 1}"})
+    with res:
+        if res.status_code not in (200, 206):
+            raise IOError(f"HTTP {res.status_code}")
+        head = b""
+        for chunk in res.iter_content(chunk_size=PEEK_BYTES):
+            head += chunk
+            if len(head) >= PEEK_BYTES:
+                break
+
+    lines = head.decode("cp932", errors="ignore").splitlines()[:2]
+    if len(lines) < 2:
+        return None
+    header, row = next(csv.reader([lines[0]])), next(csv.reader([lines[1]]))
+    if "日付" not in header or len(row) <= header.index("日付"):
+        return None
+    return row[header.index("日付")].strip()
+
+
+class DatasetProbe:
+    """
+    1データの鮮度確認
+    - HEAD に前回の ETag / Last-Modified を付けて送り、304 なら変化なし（本体は取得しない）
+    - Last-Modified が今日より前なら古いまま（本体は取得しない）
+    - それ以外は先頭だけ取得し、「日付」列が今日なら更新済み
+    """
+
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+        self.validators = {}
+        self.fresh = False
+        self.data_date = None
+
+    def check(self, session, today_str, auth=None):
+        """戻り値: 前回から変化があったか（更新済みになった場合も True）"""
+        res = session.head(self.url, auth=auth, timeout=TIMEOUT, allow_redirects=True,
+                           headers=conditional_headers(self.validators))
+        if res.status_code == 304:
+            return False
+        if res.status_code == 405:
+            # HEAD 非対応なら毎回先頭だけ取得して確認
+            self.data_date = peek_date(session, self.url, auth)
+            self.fresh = self.data_date == today_str
+            return True
+        if res.status_code != 200:
+            raise IOError(f"HTTP {res.status_code}")
+
+        validators = {"etag": res.headers.get("ETag"), "last_modified": res.headers.get("Last-Modified")}
+        changed = validators != self.validators or not any(validators.values())
+        self.validators = validators
+        if not changed:
+            return False
+
+        last_modified = validators["last_modified"]
+        if last_modified:
+            try:
+                modified_day = email.utils.parsedate_to_datetime(last_modified).astimezone(JST).strftime("%Y%m%d")
+            except (TypeError, ValueError):
+                modified_day = None
+            if modified_day and modified_day < today_str:
+                return True
+
+        self.data_date = peek_date(session, self.url, auth)
+        self.fresh = self.data_date == today_str
+        return True
+
+
+# ==============================
+# 監視ループ
+# ==============================
+def wait_until_fresh(day=None, start=WATCH_START, deadline=WATCH_DEADLINE, datasets=DATASETS,
+                     log=print, sleep=time.sleep):
+    """
+    start（JST）から全データの「日付」が day になるまで監視
+    変化が無い間は間隔を POLL_MIN → POLL_MAX 秒まで延ばし、変化を検知したら POLL_MIN に戻す
+    戻り値: 全データが揃ったか（deadline を過ぎたら False）
+    """
+    day = day or now_jst().date()
+    today_str = day.strftime("%Y%m%d")
+    start_at, deadline_at = at_time(day, start), at_time(day, deadline)
+
+    wait = (start_at - now_jst()).total_seconds()
+    if wait > 0:
+        log(f"⏳ {start} まで待機（{wait / 60:.0f} 分）")
+        sleep(wait)
+
+    id_, pw = get_credentials_from_env()
+    auth = (id_, pw) if id_ and pw else None
+    session = make_session()
+    probes = [DatasetProbe(name, url) for name, url in datasets]
+    interval = POLL_MIN
+    while True:
+        changed = False
+        for probe in probes:
+            if probe.fresh:
+                continue
+            try:
+                if probe.check(session, today_str, auth):
+                    changed = True
+                    state = "更新済み" if probe.fresh else f"未更新（日付 {probe.data_date or '不明'}）"
+                    log(f"🔎 {probe.name}: {state}")
+            except (requests.RequestException, IOError) as e:
+                log(f"⚠️ {probe.name}: 確認に失敗 {e}")
+
+        if all(p.fresh for p in probes):
+            log(f"✅ {today_str} のデータが揃いました（{now_jst().strftime('%H:%M:%S')}）")
+            return True
+
+        remaining = (deadline_at - now_jst()).total_seconds()
+        if remaining <= 0:
+            missing = ", ".join(p.name for p in probes if not p.fresh)
+            log(f"❌ {deadline} までに更新されませんでした: {missing}")
+            return False
+        interval = POLL_MIN if changed else min(interval * POLL_BACKOFF, POLL_MAX)
+        sleep(min(interval, remaining))
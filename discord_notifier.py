@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+import time
+import queue
+import atexit
+import threading
+import requests
+from rate_limit import RateLimitedAdapter
+
+# ==============================
+# 設定
+# ==============================
+MESSAGE_LIMIT = 2000     # Discord の1メッセージの最大文字数
+REQUEST_TIMEOUT = 10     # 秒
+MAX_ATTEMPTS = 5         # 429・5xx・通信エラー時の送信回数上限
+BACKOFF_BASE = 1.0       # 5xx・通信エラー時の待機（1, 2, 4, 8 秒）
+FLUSH_TIMEOUT = 30       # 終了時に送信待ちを待つ上限（秒）
+FENCE = "```"
+
+
+# ==============================
+# メッセージ分割
+# ==============================
+def _in_fence_after(line, in_fence):
+    """行の後でコードブロック内か（開始は ``` で始まる行、終了は ``` だけの行）"""
+    stripped = line.strip()
+    if not in_fence:
+        return stripped.startswith(FENCE)
+    return stripped != FENCE
+
+
+def _blocks(content):
+    """コードブロックの外の空行・コードブロックの終わりで区切った塊（表の途中では切らない）"""
+    blocks, current, in_fence = [], [], False
+    for line in content.splitlines(keepends=True):
+        current.append(line)
+        was_in_fence, in_fence = in_fence, _in_fence_after(line, in_fence)
+        if not in_fence and (was_in_fence or not line.strip()):
+            blocks.append("".join(current))
+            current = []
+    if current:
+        blocks.append("".join(current))
+    return blocks
+
+
+def _split_long(block, limit):
+    """上限を超える塊を行単位で分割（1行が上限を超える場合は文字数で切る）"""
+    pieces, current = [], ""
+    for line in block.splitlines(keepends=True):
+        while len(line) > limit:
+            pieces.append(line[:limit])
+            line = line[limit:]
+        if current and len(current) + len(line) > limit:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _close_fences(chunks):
+    """コードブロックの途中で分かれたメッセージは、末尾で閉じて次のメッセージの先頭で開き直す"""
+    out, in_fence = [], False
+    for chunk in chunks:
+        reopen = in_fence
+        # 開き直しの ``` を足す前に判定する（足した後だと、それを閉じと読んでしまう）
+        for line in chunk.splitlines(keepends=True):
+            in_fence = _in_fence_after(line, in_fence)
+        if reopen:
+            chunk = FENCE + "\n" + chunk
+        if in_fence:
+            chunk = chunk if chunk.endswith("\n") else chunk + "\n"
+            chunk += FENCE
+        out.append(chunk)
+    return out
+
+
+def split_message(content, limit=MESSAGE_LIMIT):
+    """
+    上限文字数以内のメッセージに分割
+    表（コードブロック）・段落の境目でまとめて詰め、1つで上限を超える塊だけ行単位で分ける
+    """
+    if len(content) <= limit:
+        return [content]
+    budget = limit - 2 * (len(FENCE) + 1)  # コードブロックを閉じ・開き直す分を残す
+    chunks, current = [], ""
+    for block in _blocks(content):
+        for part in ([block] if len(block) <= budget else _split_long(block, budget)):
+            if current and len(current) + len(part) > budget:
+                chunks.append(current)
+                current = ""
+            current += part
+    if current:
+        chunks.append(current)
+    return _close_fences([c for c in chunks if c.strip()])
+
+
+# ==============================
+# バックグラウンド送信
+# ==============================
+class DiscordNotifier:
+    """
+    Webhook への送信をキューに積み、バックグラウンドのスレッドが順に送る（呼び出し側は待たない）
+    - 接続は1つのセッションで使い回し、流量は rate_limit の "discord" バケットで制限
+    - 429 は応答の retry_after（秒）だけ待って再送、5xx・通信エラーは指数バックオフで再送
+    """
+
+    def __init__(self, webhook_url, timeout=REQUEST_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+        self.webhook_url = webhook_url
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.queue = queue.Queue()
+        self.session = requests.Session()
+        self.session.mount("https://", RateLimitedAdapter("discord"))
+        self.session.mount("http://", RateLimitedAdapter("discord"))
+        self.sent = 0
+        self.failed = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def send(self, content):
+        """メッセージを上限文字数で分割してキューに追加（すぐに戻る）"""
+        if not self.webhook_url or not content:
+            return
+        for part in split_message(content):
+            self.queue.put(part)
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="discord-notifier", daemon=True)
+                self._thread.start()
+
+    def _worker(self):
+        while True:
+            part = self.queue.get()
+            try:
+                if self._post(part):
+                    self.sent += 1
+                else:
+                    self.failed += 1
+            finally:
+                self.queue.task_done()
+
+    def _post(self, content):
+        for attempt in range(self.max_attempts):
+            try:
+                res = self.session.post(self.webhook_url, json={"content": content}, timeout=self.timeout)
+            except requests.RequestException as e:
+                print(f"⚠️ Discord送信エラー（{attempt + 1}回目）: {e}")
+                time.sleep(BACKOFF_BASE * 2 ** attempt)
+                continue
+            if res.status_code == 429:
+                time.sleep(_retry_after(res, BACKOFF_BASE * 2 ** attempt))
+                continue
+            if res.status_code >= 500:
+                time.sleep(BACKOFF_BASE * 2 ** attempt)
+                continue
+            if not res.ok:
+                print(f"⚠️ Discord送信失敗: {res.status_code} {res.text[:200]}")
+                return False
+            return True
+        print(f"⚠️ Discord送信を {self.max_attempts} 回試行しましたが失敗しました")
+        return False
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """キューが空になるまで待つ（timeout 秒で打ち切り）。戻り値: 全件送り終えたか"""
+        deadline = time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f"⚠️ Discord送信待ちを打ち切り（未送信 {self.queue.unfinished_tasks} 件）")
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+
+def _retry_after(res, default):
+    """429 応答の待機秒数（JSON の retry_after → Retry-After ヘッダーの順に参照）"""
+    try:
+        return float(res.json()["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(res.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return default
+
+
+# ==============================
+# プロセス内で共通の送信口
+# ==============================
+_notifiers = {}
+_notifiers_lock = threading.Lock()
+
+
+def get_notifier(webhook_url):
+    """Webhook URL ごとの DiscordNotifier（プロセス内で共通）"""
+    with _notifiers_lock:
+        if webhook_url not in _notifiers:
+            _notifiers[webhook_url] = DiscordNotifier(webhook_url)
+        return _notifiers[webhook_url]
+
+
+def notify(webhook_url, content):
+    """送信を予約してすぐに戻る（webhook_url が空なら何もしない）"""
+    if webhook_url:
+        get_notifier(webhook_url).send(content)
+
+
+def flush_all(timeout=FLUSH_TIMEOUT):
+    """全 Webhook の送信待ちを、合わせて timeout 秒まで待つ"""
+    deadline = time.monotonic() + timeout
+    ok = True
+    for notifier in list(_notifiers.values()):
+        ok = notifier.flush(max(0.0, deadline - time.monotonic())) and ok
+    return ok
+
+
+# プロセス終了時に未送信分を送り切る（上限 FLUSH_TIMEOUT 秒）
+atexit.register(flush_all)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import hashlib
+
+# ==============================
+# 設定
+# ==============================
+CHUNK_SIZE = 1024 * 256  # 256KB ずつ書き込む
+META_SUFFIX = ".meta.json"  # ETag / Last-Modified / ハッシュを保存するサイドカー
+
+
+# ==============================
+# サイドカー（前回取得時のヘッダとハッシュ）
+# ==============================
+def meta_path_for(save_path):
+    return save_path + META_SUFFIX
+
+
+def load_meta(save_path):
+    """前回取得時のメタ情報（ファイル本体が無い場合は使わない）"""
+    meta_path = meta_path_for(save_path)
+    if not (os.path.exists(save_path) and os.path.exists(meta_path)):
+        return {}
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_meta(save_path, meta):
+    meta_path = meta_path_for(save_path)
+    tmp_path = meta_path + ".part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
+def conditional_headers(meta):
+    """前回の ETag / Last-Modified から条件付きリクエスト用ヘッダを作成"""
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+# ==============================
+# ダウンロード本体
+# ==============================
+def fetch_to_file(session, url, save_path, auth=None, timeout=20):
+    """
+    URL を .part にチャンク単位でストリーム保存し、完全に受信できた場合だけリネーム
+    戻り値: (status, response)
+      "downloaded"   : 新しい内容を保存した
+      "not_modified" : 304（手元のファイルをそのまま使う）
+      "unchanged"    : 200 だが前回と同じ内容（ハッシュ一致）のため置き換えなし
+      "error"        : 200/304 以外（response のステータスで呼び出し側が判断）
+    通信エラー・途中切断は requests.RequestException / IOError を送出
+    """
+    meta = load_meta(save_path)
+    response = session.get(url, auth=auth, timeout=timeout, stream=True,
+                           headers=conditional_headers(meta))
+
+    if response.status_code == 304:
+        response.close()
+        return "not_modified", response
+    if response.status_code != 200:
+        return "error", response
+
+    tmp_path = save_path + ".part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with response, open(tmp_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+
+        # Content-Length と受信サイズが合わなければ途中切断とみなす（圧縮転送時は判定しない）
+        expected = response.headers.get("Content-Length")
+        if expected and not response.headers.get("Content-Encoding") and int(expected) != size:
+            raise IOError(f"受信サイズ不一致: {size} / {expected} bytes")
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    new_meta = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "sha256": digest.hexdigest(),
+        "size": size,
+    }
+
+    if meta.get("sha256") == new_meta["sha256"] and os.path.exists(save_path):
+        # 同じ内容なら置き換えない（mtime が変わらずキャッシュも作り直さない）
+        os.remove(tmp_path)
+        save_meta(save_path, new_meta)
+        return "unchanged", response
+
+    os.replace(tmp_path, save_path)
+    save_meta(save_path, new_meta)
+    return "downloaded", response
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+# ==============================
+# 設定
+# ==============================
+# sector_log は時価総額帯ごとに行があるため帯もキーに含める（momentum_log は日付＋業種）
+KEY_COLUMNS = ["日付", "業種", "時価総額帯"]
+KEY_SEP = "\x1f"  # キー連結用（業種名などに出てこない区切り文字）
+DATE_FORMAT = "%Y/%m/%d"
+
+
+def key_columns_for(columns):
+    """列一覧に含まれるキー列（日付・業種〔・時価総額帯〕）"""
+    return [c for c in KEY_COLUMNS if c in columns]
+
+
+def normalize_dates(dates):
+    """
+    日付を YYYY/MM/DD に統一（ゼロ埋め・区切り文字の差異を吸収）
+    ユニークな日付だけを変換して戻すので、2万行でも変換は日数分で済む
+    """
+    dates = pd.Series(dates).astype(str)
+    unique = pd.Series(dates.unique())
+    # 通常は既に YYYY/MM/DD なので、その形式で読めなかったものだけを柔軟にパース
+    parsed = pd.to_datetime(unique, errors="coerce", format=DATE_FORMAT)
+    failed = parsed.isna()
+    if failed.any():
+        parsed[failed] = pd.to_datetime(unique[failed], errors="coerce", format="mixed")
+    parsed = parsed.dt.strftime(DATE_FORMAT)
+    mapping = dict(zip(unique, parsed.where(parsed.notna(), unique)))
+    return dates.map(mapping)
+
+
+def make_keys(df, key_cols=None):
+    """キー列を正規化して1本の文字列キー（Series）にする"""
+    key_cols = key_columns_for(df.columns) if key_cols is None else key_cols
+    parts = []
+    for col in key_cols:
+        values = df[col]
+        parts.append(normalize_dates(values).to_numpy() if col == "日付" else values.astype(str).str.strip().to_numpy())
+    keys = pd.Series(parts[0], index=df.index, dtype=object)
+    for part in parts[1:]:
+        keys = keys + KEY_SEP + part
+    return keys
+
+
+# ==============================
+# キー索引（ファイルをまたいで追加分だけ更新）
+# ==============================
+class KeyIndex:
+    """
+    既存行のキーを pd.Index（ハッシュ表）で保持し、新しい DataFrame から未登録の行だけを取り出す
+    既存データの正規化は最初の1回だけで、以降は追加した行のキーを足すだけ
+    """
+
+    def __init__(self, existing_df=None, key_cols=None):
+        self.key_cols = key_cols
+        self._index = pd.Index([], dtype=object)
+        if existing_df is not None and not existing_df.empty:
+            self.add(existing_df)
+
+    def __len__(self):
+        return len(self._index)
+
+    def _make_keys(self, df):
+        if self.key_cols is None:
+            self.key_cols = key_columns_for(df.columns)
+        return make_keys(df, self.key_cols)
+
+    def _missing(self, keys):
+        """索引に無いキーなら True の配列"""
+        return self._index.get_indexer(keys) == -1
+
+    def add(self, df):
+        """行のキーを索引に追加"""
+        if df.empty:
+            return
+        keys = pd.Index(self._make_keys(df)).drop_duplicates()
+        self._index = self._index.append(keys[self._missing(keys)])
+
+    def new_rows(self, df):
+        """索引に無いキーの行だけを返す（ベクトル化したアンチ結合）"""
+        if df.empty or not len(self._index):
+            return df
+        return df[self._missing(self._make_keys(df))]
+
+    def merge(self, df):
+        """未登録の行を返し、そのキーを索引に追加"""
+        new_df = self.new_rows(df)
+        self.add(new_df)
+        return new_df
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+import contextlib
+import pandas as pd
+from pathlib import Path
+from turnover_state import momentum_columns
+from keyed_merge import normalize_dates
+
+# ==============================
+# 設定
+# ==============================
+DB_FILE = Path("data/state/logs.sqlite")  # git には含めない（CI では actions/cache で引き継ぐ）
+SHEET_MAX_ROWS = 19800  # シート側の保持行数（ヘッダー除く）
+
+# ==============================
+# スキーマ（sector_log / momentum_log）
+# ==============================
+SECTOR_LOG_SCHEMA = {
+    "日付": "TEXT",
+    "業種": "TEXT",
+    "時価総額帯": "TEXT",
+    "上昇銘柄数": "INTEGER",
+    "下落銘柄数": "INTEGER",
+    "時価総額加重平均騰落率": "REAL",
+    "売買代金合計": "INTEGER",
+    "平均騰落率順位": "INTEGER",
+}
+# momentum_summary の列は turnover_state の窓設定（MOMENTUM_PAIRS / EWMA_PAIRS）に従う
+MOMENTUM_LOG_SCHEMA = {c: "TEXT" if c in ("日付", "業種") else "REAL" for c in momentum_columns()}
+
+# テーブル名（＝シート名）→ (スキーマ, キー列)
+LOGS = {
+    "sector_log": (SECTOR_LOG_SCHEMA, ["日付", "業種", "時価総額帯"]),
+    "momentum_log": (MOMENTUM_LOG_SCHEMA, ["日付", "業種"]),
+}
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+# ==============================
+# 接続・テーブル作成
+# ==============================
+def connect(path=DB_FILE):
+    """DB に接続し、無ければテーブルとインデックスを作成"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    for name, (schema, keys) in LOGS.items():
+        columns = ", ".join(f"{_quote(c)} {t}" for c, t in schema.items())
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {name} ({columns})")
+        # 窓設定の変更などで増えた列を追加（既存行は NULL）
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({name})")}
+        for c, t in schema.items():
+            if c not in existing:
+                conn.execute(f"ALTER TABLE {name} ADD COLUMN {_quote(c)} {t}")
+        conn.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {name}_key ON {name} ({', '.join(_quote(k) for k in keys)})"
+        )
+    conn.execute("CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, watermark TEXT)")
+    if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+        with conn:
+            _normalize_stored_dates(conn)
+            conn.execute("PRAGMA user_version = 1")
+    return conn
+
+
+def _normalize_stored_dates(conn):
+    """
+    日付を正規化する前に保存された YYYY-MM-DD の行を YYYY/MM/DD に直す
+    同じキーの YYYY/MM/DD の行が既にあればそちらを残す
+    """
+    for name in LOGS:
+        conn.execute(f"UPDATE OR IGNORE {name} SET 日付 = replace(日付, '-', '/') WHERE 日付 LIKE '____-__-__'")
+        conn.execute(f"DELETE FROM {name} WHERE 日付 LIKE '____-__-__'")
+    conn.execute("UPDATE sync_state SET watermark = replace(watermark, '-', '/') WHERE watermark LIKE '____-__-__'")
+
+
+@contextlib.contextmanager
+def open_db(path=DB_FILE):
+    """with ブロックを抜けたらコミットして閉じる"""
+    conn = connect(path)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+# ==============================
+# 型変換
+# ==============================
+def normalize(name, df):
+    """
+    シート（全て文字列）や CSV から読んだ DataFrame をスキーマの型に揃える
+    数値列はカンマ区切り・空文字にも対応
+    """
+    schema, _ = LOGS[name]
+    out = pd.DataFrame(index=df.index)
+    for col, sql_type in schema.items():
+        if col not in df.columns:
+            out[col] = None
+            continue
+        values = df[col]
+        if col == "日付":
+            # 旧アップローダーが書いた YYYY-MM-DD などの表記ゆれを YYYY/MM/DD に統一（キー・ウォーターマークの比較用）
+            out[col] = normalize_dates(values).to_numpy()
+            continue
+        if sql_type == "TEXT":
+            out[col] = values.astype(str)
+            continue
+        if values.dtype == object:
+            values = values.astype(str).str.replace(",", "", regex=False)
+        values = pd.to_numeric(values, errors="coerce")
+        if sql_type == "INTEGER" and values.notna().all():
+            values = values.astype("int64")
+        out[col] = values
+    return out
+
+
+def _records(df):
+    """sqlite3 に渡せる Python の値（NaN は NULL）の行リスト"""
+    columns = [df[c].astype(object).where(df[c].notna(), None).tolist() for c in df.columns]
+    return list(zip(*columns))
+
+
+# ==============================
+# 書込・読込
+# ==============================
+def write_log(name, df, path=DB_FILE):
+    """キー（日付・業種〔・時価総額帯〕）が同じ行は置き換えて保存（同日の再実行でも重複しない）"""
+    schema, _ = LOGS[name]
+    df = normalize(name, df)
+    placeholders = ", ".join("?" * len(schema))
+    columns = ", ".join(_quote(c) for c in schema)
+    with open_db(path) as conn:
+        conn.executemany(f"INSERT OR REPLACE INTO {name} ({columns}) VALUES ({placeholders})", _records(df))
+    return len(df)
+
+
+def read_log(name, start=None, end=None, after=None, max_dates=None, max_rows=None, path=DB_FILE):
+    """
+    ログを型付きで読込（シートと同じく新しい日付が上、同日内は保存順）
+    start / end: 日付（YYYY/MM/DD）の範囲（両端含む）、after: この日付より後
+    max_dates: 直近 n 日分のみ、max_rows: 新しい順に n 行まで（シートの保持行数と揃える場合）
+    """
+    schema, _ = LOGS[name]
+    where, params = [], []
+    if start is not None:
+        where.append("日付 >= ?")
+        params.append(start)
+    if end is not None:
+        where.append("日付 <= ?")
+        params.append(end)
+    if after is not None:
+        where.append("日付 > ?")
+        params.append(after)
+    if max_dates is not None:
+        where.append(f"日付 IN (SELECT DISTINCT 日付 FROM {name} ORDER BY 日付 DESC LIMIT ?)")
+        params.append(int(max_dates))
+
+    sql = f"SELECT {', '.join(_quote(c) for c in schema)} FROM {name}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY 日付 DESC, rowid"
+    if max_rows is not None:
+        sql += " LIMIT ?"
+        params.append(int(max_rows))
+
+    with open_db(path) as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+
+def count_rows(name, path=DB_FILE):
+    with open_db(path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+
+
+# ==============================
+# シート同期の基準日（ウォーターマーク）
+# ==============================
+def get_watermark(name, path=DB_FILE):
+    """シートへ反映済みの最新日付（未同期なら None）"""
+    with open_db(path) as conn:
+        row = conn.execute("SELECT watermark FROM sync_state WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def set_watermark(name, date, path=DB_FILE):
+    with open_db(path) as conn:
+        conn.execute("INSERT OR REPLACE INTO sync_state (name, watermark) VALUES (?, ?)", (name, date))
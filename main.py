@@ -6,15 +6,19 @@ import datetime
 import logging
 import argparse
 import time
-import requests
-try:
-    import jpholiday
-except ImportError:
-    jpholiday = None
+import io
+import re
+import json
+import threading
+import contextlib
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import market_calendar
+import rate_limit
+import discord_notifier
+import data_watch
 from cleanup_old_data import run_cleanup
 
-run_cleanup()
-
 # ==============================
 # 設定（必要なら変更）
 # ==============================
@@ -30,6 +34,18 @@ SCRIPTS = [
 ]
 DEFAULT_TIMEOUT = 600
 
+# ステージ依存関係（値のステージがすべて完了してから実行）
+STAGE_DEPENDS = {
+    "1-csv_downloader_individuals_v01.py": [],
+    "2-csv_downloader_index_v01.py": [],
+    "3-data_processor_v01.py": ["1-csv_downloader_individuals_v01.py", "2-csv_downloader_index_v01.py"],
+    "4-google_sheets_uploader_v02.py": ["3-data_processor_v01.py"],
+    "5-momentum_analyzer_v03.py": ["4-google_sheets_uploader_v02.py"],
+    "6-summary_sender_v01.py": ["4-google_sheets_uploader_v02.py"],
+}
+MAX_PARALLEL = 2  # 同時実行するステージ数の上限
+CHECKPOINT_DIR = os.path.join(ROOT_DIR, "data", "state")
+
 os.makedirs(LOG_DIR, exist_ok=True)
 
 # ==============================
@@ -55,12 +71,8 @@ logger.addHandler(fh)
 # ==============================
 DISCORD_WEBHOOK = os.environ.get("DISCORD_WEBHOOK")
 def notify_discord(msg: str):
-    if not DISCORD_WEBHOOK:
-        return
-    try:
-        requests.post(DISCORD_WEBHOOK, json={"content": msg}, timeout=10)
-    except Exception as e:
-        logger.warning(f"Discord通知に失敗: {e}")
+    """送信はバックグラウンド（パイプラインは Webhook の応答を待たない。終了時に未送信分を送り切る）"""
+    discord_notifier.notify(DISCORD_WEBHOOK, msg)
 
 # ==============================
 # 実行ユーティリティ
@@ -91,19 +103,208 @@ def run_script(script_name: str, timeout: int = DEFAULT_TIMEOUT):
         return False
 
 # ==============================
-# 実行スキップ判定（土日祝）
+# in-process 実行ユーティリティ
 # ==============================
-def is_holiday_or_weekend(date: datetime.date) -> bool:
-    if date.weekday() >= 5:  # 5=土, 6=日
+class StageLogWriter(io.TextIOBase):
+    """ステージ内の print を1行ずつ logger に流す（run_script と同じ形式）"""
+    def __init__(self, script_name: str, level: int = logging.INFO, tag: str = ""):
+        self.script_name = script_name
+        self.level = level
+        self.tag = tag
+        self._buf = ""
+
+    def writable(self):
         return True
-    if jpholiday and jpholiday.is_holiday(date):
+
+    def write(self, s):
+        self._buf += s
+        *lines, self._buf = self._buf.split("\n")
+        for line in lines:
+            logger.log(self.level, f"[{self.script_name}]{self.tag} {line}")
+        return len(s)
+
+    def flush(self):
+        if self._buf:
+            logger.log(self.level, f"[{self.script_name}]{self.tag} {self._buf}")
+            self._buf = ""
+
+
+class ThreadRoutedStream(io.TextIOBase):
+    """スレッドごとに出力先を切り替える sys.stdout / sys.stderr の代理（並列実行用）"""
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def writable(self):
+        return True
+
+    def _target(self):
+        return getattr(self.local, "target", None) or self.default
+
+    def write(self, s):
+        return self._target().write(s)
+
+    def flush(self):
+        self._target().flush()
+
+
+@contextlib.contextmanager
+def stage_output(out, err):
+    """実行中スレッドの print だけを out / err に流す（並列実行中の他ステージとは混ざらない）"""
+    routers = []
+    for name, target in (("stdout", out), ("stderr", err)):
+        stream = getattr(sys, name)
+        if not isinstance(stream, ThreadRoutedStream):
+            stream = ThreadRoutedStream(stream)
+            setattr(sys, name, stream)
+        stream.local.target = target
+        routers.append(stream)
+    try:
+        yield
+    finally:
+        for stream in routers:
+            stream.local.target = None
+
+
+def load_stage(script_name: str):
+    """ステージスクリプトをモジュールとして読み込む（ファイル名に '-' を含むため importlib を使用）"""
+    script_path = os.path.join(ROOT_DIR, script_name)
+    if not os.path.exists(script_path):
+        raise FileNotFoundError(f"{script_path} does not exist")
+    module_name = "stage_" + re.sub(r"\W", "_", os.path.splitext(script_name)[0])
+    spec = importlib.util.spec_from_file_location(module_name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_stage(script_name: str, call, ctx: dict):
+    """ステージを同一プロセスで実行。開始・終了・経過時間は run_script と同じ形式でログ出力"""
+    start = datetime.datetime.now()
+    logger.info(f"START {script_name}")
+    out = StageLogWriter(script_name)
+    err = StageLogWriter(script_name, logging.ERROR, "[ERR]")
+    try:
+        with stage_output(out, err):
+            try:
+                call(load_stage(script_name), ctx)
+            finally:
+                out.flush()
+                err.flush()
+        elapsed = (datetime.datetime.now() - start).total_seconds()
+        logger.info(f"END {script_name} (elapsed {elapsed:.1f}s)")
         return True
-    return False
+    except Exception as e:
+        logger.exception(f"Error running {script_name}: {e}")
+        return False
+
+
+# 各ステージの呼び出し方（ctx で DataFrame を後続ステージに受け渡す）
+def _call_download(module, ctx):
+    if not module.run():
+        raise RuntimeError("ダウンロードに失敗しました")
+
+def _call_processor(module, ctx):
+    ctx["sector_df"], ctx["momentum_df"] = module.run()
+
+def _call_uploader(module, ctx):
+    ctx["sector_log"], ctx["momentum_log"] = module.run(ctx.get("sector_df"), ctx.get("momentum_df"))
+
+def _call_log_reader(module, ctx):
+    module.run(ctx.get("sector_log"), ctx.get("momentum_log"))
+
+STAGE_CALLS = {
+    "1-csv_downloader_individuals_v01.py": _call_download,
+    "2-csv_downloader_index_v01.py": _call_download,
+    "3-data_processor_v01.py": _call_processor,
+    "4-google_sheets_uploader_v02.py": _call_uploader,
+    "5-momentum_analyzer_v03.py": _call_log_reader,
+    "6-summary_sender_v01.py": _call_log_reader,
+}
+
+# ==============================
+# チェックポイント（日ごとの完了ステージ）
+# ==============================
+def checkpoint_path(date_str: str) -> str:
+    return os.path.join(CHECKPOINT_DIR, f"pipeline_checkpoint_{date_str}.json")
+
+
+def load_checkpoint(date_str: str) -> list:
+    path = checkpoint_path(date_str)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("completed", [])
+
+
+def save_checkpoint(date_str: str, completed: list):
+    """一時ファイルに書いてからリネーム。前日以前のチェックポイントは削除"""
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = checkpoint_path(date_str)
+    with open(path + ".part", "w", encoding="utf-8") as f:
+        json.dump({"date": date_str, "completed": completed}, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".part", path)
+    for name in os.listdir(CHECKPOINT_DIR):
+        if name.startswith("pipeline_checkpoint_") and name.endswith(".json") and name != os.path.basename(path):
+            os.remove(os.path.join(CHECKPOINT_DIR, name))
+
+
+# ==============================
+# 依存関係つきスケジューラ
+# ==============================
+def run_pipeline(run_one, completed: list, on_complete=None, continue_on_error=False) -> bool:
+    """
+    STAGE_DEPENDS に従い、依存が揃ったステージから並列実行（最大 MAX_PARALLEL）
+    run_one: ステージ名を受け取り成否を返す関数
+    completed: チェックポイント済みのステージ（実行しない）
+    失敗したステージに依存するステージは実行しない
+    """
+    done = set(completed)
+    failed, skipped = set(), set()
+    for script in SCRIPTS:
+        if script in done:
+            logger.info(f"SKIP {script}（本日分は完了済み）")
+    pending = [s for s in SCRIPTS if s not in done]
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL) as pool:
+        while pending or running:
+            if not failed or continue_on_error:
+                for script in list(pending):
+                    deps = STAGE_DEPENDS.get(script, [])
+                    blocked = [d for d in deps if d in failed or d in skipped]
+                    if blocked:
+                        pending.remove(script)
+                        skipped.add(script)
+                        logger.warning(f"SKIP {script}（依存ステージが未完了: {', '.join(blocked)}）")
+                    elif all(d in done for d in deps) and len(running) < MAX_PARALLEL:
+                        pending.remove(script)
+                        running[pool.submit(run_one, script)] = script
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                script = running.pop(future)
+                if future.result():
+                    done.add(script)
+                    if on_complete:
+                        on_complete(script)
+                else:
+                    failed.add(script)
+
+    return not failed and not skipped and not pending
+
+# ==============================
+# 実行スキップ判定（土日祝・年末年始）
+# ==============================
+def is_holiday_or_weekend(date: datetime.date) -> bool:
+    return market_calendar.is_holiday_or_weekend(date)
 
 # ==============================
 # メイン処理
 # ==============================
-def main(continue_on_error=False):
+def main(continue_on_error=False, in_process=False, restart=False):
     today = datetime.date.today()
     if is_holiday_or_weekend(today):
         msg = f"⏭️ {today} は休場日（土日祝）のためスキップしました。"
@@ -111,13 +312,30 @@ def main(continue_on_error=False):
         notify_discord(msg)
         return 0
 
-    overall_ok = True
-    for script in SCRIPTS:
-        ok = run_script(script)
-        if not ok:
-            overall_ok = False
-            if not continue_on_error:
-                break
+    # チェックポイント（restart=True なら最初から）
+    date_str = today.strftime("%Y%m%d")
+    completed = [] if restart else load_checkpoint(date_str)
+
+    def mark_done(script):
+        completed.append(script)
+        save_checkpoint(date_str, completed)
+
+    ctx = {}  # in-process モードでステージ間に渡す DataFrame
+    if in_process:
+        run_one = lambda script: run_stage(script, STAGE_CALLS[script], ctx)
+    else:
+        run_one = run_script
+
+    overall_ok = run_pipeline(run_one, completed, on_complete=mark_done, continue_on_error=continue_on_error)
+    api_stats = rate_limit.format_stats()  # in-process モードのみ（subprocess 実行時は各ステージ内で計測）
+    if api_stats:
+        logger.info(f"API 呼び出し: {api_stats}")
+
+    # 古いデータの整理（パイプライン実行後、失敗しても結果には影響させない）
+    try:
+        run_cleanup(today)
+    except Exception as e:
+        logger.warning(f"古いデータの整理に失敗: {e}")
 
     if overall_ok:
         notify_discord(f"✅ Momentum run succeeded: {datetime.datetime.now().isoformat()}")
@@ -126,6 +344,39 @@ def main(continue_on_error=False):
         notify_discord(f"❌ Momentum run FAILED: {datetime.datetime.now().isoformat()}")
         return 2
 
+# ==============================
+# データ更新の監視 → 実行
+# ==============================
+def watch_and_run(start=data_watch.WATCH_START, deadline=data_watch.WATCH_DEADLINE, **run_kwargs):
+    """
+    start（JST）から kabu.plus の本日分を監視し、2データとも「日付」が今日になった時点でパイプラインを実行
+    deadline までに揃わなければ実行せずに通知（古いデータで集計しない）
+    """
+    day = data_watch.now_jst().date()
+    if is_holiday_or_weekend(day):
+        return main(**run_kwargs)  # 休場日のスキップ・通知は main に任せる
+
+    logger.info(f"👀 {day} のデータ更新を監視（{start} 開始・{deadline} 締切）")
+    if not data_watch.wait_until_fresh(day, start, deadline, log=logger.info):
+        msg = f"⚠️ {day} の kabu.plus データが {deadline} までに更新されなかったため、実行を見送りました。"
+        logger.error(msg)
+        notify_discord(msg)
+        return 3
+    return main(**run_kwargs)
+
+
+def watch_forever(start=data_watch.WATCH_START, deadline=data_watch.WATCH_DEADLINE, **run_kwargs):
+    """毎日 start から監視し、データが揃い次第1回実行（締切後に起動した日は翌日から）"""
+    last_day = None
+    while True:
+        now = data_watch.now_jst()
+        if now.date() != last_day and now < data_watch.at_time(now.date(), deadline):
+            last_day = now.date()
+            watch_and_run(start, deadline, **run_kwargs)
+            continue
+        next_start = data_watch.at_time(now.date() + datetime.timedelta(days=1), start)
+        time.sleep(max(1.0, (next_start - now).total_seconds()))
+
 # ==============================
 # CLI 起動
 # ==============================
@@ -133,18 +384,27 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--once", action="store_true")
     parser.add_argument("--continue-on-error", action="store_true")
+    parser.add_argument("--in-process", action="store_true",
+                        help="全ステージを1プロセスで実行（認証・DataFrameを共有）。省略時はステージごとに subprocess")
+    parser.add_argument("--restart", action="store_true",
+                        help="本日のチェックポイントを無視して最初から実行")
+    parser.add_argument("--watch", action="store_true",
+                        help="本日分のデータ更新を監視し、揃い次第1回だけ実行（締切までに揃わなければ通知して終了）")
+    parser.add_argument("--watch-start", default=data_watch.WATCH_START,
+                        help=f"監視を始める時刻 HH:MM（JST、既定 {data_watch.WATCH_START}、環境変数 WATCH_START）")
+    parser.add_argument("--watch-deadline", default=data_watch.WATCH_DEADLINE,
+                        help=f"監視の締切 HH:MM（JST、既定 {data_watch.WATCH_DEADLINE}、環境変数 WATCH_DEADLINE）")
     args = parser.parse_args()
+    run_kwargs = dict(continue_on_error=args.continue_on_error, in_process=args.in_process, restart=args.restart)
 
-    if os.environ.get("GITHUB_ACTIONS") or args.once:
-        sys.exit(main(continue_on_error=args.continue_on_error))
+    if args.once:
+        sys.exit(main(**run_kwargs))
+    if os.environ.get("GITHUB_ACTIONS") or args.watch:
+        sys.exit(watch_and_run(args.watch_start, args.watch_deadline, **run_kwargs))
 
     try:
-        import schedule
-        logger.info("Starting local scheduler (daily at 17:00). Use Ctrl+C to stop.")
-        schedule.every().day.at("17:00").do(lambda: main(continue_on_error=args.continue_on_error))
-        while True:
-            schedule.run_pending()
-            time.sleep(30)
+        logger.info(f"Starting local watcher (daily from {args.watch_start} JST until data is published). Use Ctrl+C to stop.")
+        watch_forever(args.watch_start, args.watch_deadline, **run_kwargs)
     except KeyboardInterrupt:
         logger.info("Interrupted by user. Exiting.")
-        sys.exit(0)
\ No newline at end of file
+        sys.exit(0)
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import datetime
+try:
+    import jpholiday
+except ImportError:
+    jpholiday = None
+
+
+# ==============================
+# 東証の営業日判定
+# ==============================
+def is_year_end_holiday(date: datetime.date) -> bool:
+    """東証の年末年始休業日（12/31〜1/3）"""
+    return (date.month == 12 and date.day == 31) or (date.month == 1 and date.day <= 3)
+
+
+def is_holiday_or_weekend(date: datetime.date) -> bool:
+    if date.weekday() >= 5:  # 5=土, 6=日
+        return True
+    if jpholiday and jpholiday.is_holiday(date):
+        return True
+    if is_year_end_holiday(date):
+        return True
+    return False
+
+
+def business_days(end: datetime.date, n_days: int) -> list:
+    """end 以前の直近 n_days 営業日（古い順）"""
+    days = []
+    date = end
+    while len(days) < n_days:
+        if not is_holiday_or_weekend(date):
+            days.append(date)
+        date -= datetime.timedelta(days=1)
+    return days[::-1]
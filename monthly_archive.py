@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import re
+import shutil
+import zipfile
+import fnmatch
+import datetime
+from pathlib import Path
+from collections import defaultdict
+
+# ==============================
+# 設定
+# ==============================
+DATA_DIR = Path("data")
+ARCHIVE_DIR = Path("data/archive")  # data/ と同じサブフォルダ構成で月別の .zip を置く
+COMPRESS_LEVEL = 9
+
+# ファイル名の日付（YYYYMMDD / YYYY-MM-DD）
+DATE_PATTERN = re.compile(r"(?<!\d)(\d{4})-?(\d{2})-?(\d{2})(?!\d)")
+
+
+# ==============================
+# ファイル名の日付・アーカイブのパス
+# ==============================
+def file_date(name):
+    """ファイル名に含まれる日付（datetime.date）。無ければ None"""
+    m = DATE_PATTERN.search(name)
+    if not m:
+        return None
+    try:
+        return datetime.date(int(m[1]), int(m[2]), int(m[3]))
+    except ValueError:
+        return None
+
+
+def archive_dir_for(directory):
+    """data/<sub> → data/archive/<sub>"""
+    directory = Path(directory)
+    try:
+        relative = directory.relative_to(DATA_DIR.resolve() if directory.is_absolute() else DATA_DIR)
+    except ValueError:
+        relative = Path(directory.parent.name) / directory.name
+    return ARCHIVE_DIR / relative
+
+
+def archive_path_for(path):
+    """data/raw/<sub>/<prefix>_YYYYMMDD.csv → data/archive/raw/<sub>/<prefix>_YYYYMM.zip"""
+    path = Path(path)
+    m = DATE_PATTERN.search(path.name)
+    if not m:
+        raise ValueError(f"ファイル名に日付がありません: {path}")
+    rest = path.name[:m.start()] + path.name[m.end():]
+    prefix = rest.split(".", 1)[0].strip("_-")
+    name = f"{prefix}_{m[1]}{m[2]}.zip" if prefix else f"{m[1]}{m[2]}.zip"
+    return archive_dir_for(path.parent) / name
+
+
+def _crc32(path):
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            crc = zipfile.crc32(chunk, crc)
+    return crc
+
+
+# ==============================
+# アーカイブへの追加
+# ==============================
+def archive_files(paths):
+    """
+    ファイルを月別の .zip に追加し、格納を確認できたものだけ削除
+    - 同じ名前・同じ内容が格納済みなら .zip には触れずに削除、内容が異なる場合は残す
+    - 追加がある場合だけ .part にコピーして追記 → 検証 → リネーム（途中で落ちても既存の .zip は壊れない）
+    ※ .zip はコミットされるため、書き直しは最小限に（cleanup_old_data は月が締まってから1回でまとめる）
+    戻り値: アーカイブに移したファイル数
+    """
+    groups = defaultdict(list)
+    for path in paths:
+        groups[archive_path_for(path)].append(Path(path))
+
+    moved = 0
+    for archive, files in sorted(groups.items()):
+        stored = {}
+        if archive.exists():
+            with zipfile.ZipFile(archive) as zf:
+                stored = {info.filename: info.CRC for info in zf.infolist()}
+
+        new, done = [], []
+        for path in sorted(files):
+            if path.name not in stored:
+                new.append(path)
+            elif stored[path.name] == _crc32(path):
+                done.append(path)
+            else:
+                print(f"⚠️ アーカイブ済みの内容と異なるため残します: {path}")
+
+        if new:
+            if not _append_to_archive(archive, new):
+                continue
+            done += new
+
+        for path in done:
+            path.unlink()
+        moved += len(done)
+        print(f"[アーカイブ] {len(done)} ファイル → {archive}（追加 {len(new)} 件）")
+    return moved
+
+
+def _append_to_archive(archive, paths):
+    """.zip のコピーに追記して検証してから置き換える。戻り値: 成功したか"""
+    archive.parent.mkdir(parents=True, exist_ok=True)
+    tmp = archive.with_name(archive.name + ".part")
+    if archive.exists():
+        shutil.copy2(archive, tmp)
+    elif tmp.exists():
+        tmp.unlink()
+
+    with zipfile.ZipFile(tmp, "a", compression=zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL) as zf:
+        for path in paths:
+            zf.write(path, path.name)
+
+    with zipfile.ZipFile(tmp) as zf:
+        broken = zf.testzip()
+    if broken is not None:
+        tmp.unlink()
+        print(f"❌ アーカイブの検証に失敗（{broken}）: {archive}")
+        return False
+    os.replace(tmp, archive)
+    return True
+
+
+# ==============================
+# アーカイブからの読込・一覧
+# ==============================
+def is_archived(path):
+    """ファイルが月別アーカイブに格納済みか"""
+    path = Path(path)
+    if file_date(path.name) is None:
+        return False
+    archive = archive_path_for(path)
+    if not archive.exists():
+        return False
+    with zipfile.ZipFile(archive) as zf:
+        return path.name in zf.NameToInfo
+
+
+def open_member(path):
+    """アーカイブに移したファイルを元のパスで開く（バイナリ）。無ければ FileNotFoundError"""
+    path = Path(path)
+    if file_date(path.name) is None:
+        raise FileNotFoundError(path)
+    archive = archive_path_for(path)
+    if not archive.exists():
+        raise FileNotFoundError(path)
+    with zipfile.ZipFile(archive) as zf:
+        try:
+            return io.BytesIO(zf.read(path.name))
+        except KeyError:
+            raise FileNotFoundError(path) from None
+
+
+def list_files(directory, pattern):
+    """
+    directory 直下のファイルと、アーカイブ済みのファイルを合わせた一覧（名前順）
+    アーカイブ済みのものも元のパス（directory/<name>）で返す → raw_loader でそのまま読める
+    """
+    directory = Path(directory)
+    names = set()
+    if directory.is_dir():
+        with os.scandir(directory) as entries:
+            names.update(e.name for e in entries if e.is_file() and fnmatch.fnmatch(e.name, pattern))
+
+    archive_dir = archive_dir_for(directory)
+    if archive_dir.is_dir():
+        with os.scandir(archive_dir) as entries:
+            archives = [e.path for e in entries if e.is_file() and e.name.endswith(".zip")]
+        for archive in archives:
+            with zipfile.ZipFile(archive) as zf:
+                names.update(n for n in zf.namelist() if fnmatch.fnmatch(n, pattern))
+    return [directory / name for name in sorted(names)]
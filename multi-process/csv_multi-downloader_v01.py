@@ -15,15 +15,27 @@
 
 import os
 import sys
+import time
 import datetime
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from market_calendar import business_days
+from raw_loader import build_cache
+from http_download import fetch_to_file
+from monthly_archive import is_archived
 
 # --- 設定 ---
-BASE_URL = "https://csvex.com/kabu.plus/csv/tosho-index-data/daily/tosho-index-data"
-SAVE_DIR = os.path.join("data", "raw", "tosho_index")
+# (URL接頭辞, 保存先, ファイル名接頭辞)
+DATASETS = [
+    ("https://csvex.com/kabu.plus/csv/japan-all-stock-prices/daily/japan-all-stock-prices",
+     os.path.join("data", "raw", "japan_all_stock"), "japan-all-stock-prices"),
+    ("https://csvex.com/kabu.plus/csv/tosho-index-data/daily/tosho-index-data",
+     os.path.join("data", "raw", "tosho_index"), "tosho-index-data"),
+]
 TIMEOUT = 20  # 秒
+MAX_WORKERS = 4  # 同時ダウンロード数の上限
 # ----------------
 
 def get_credentials_from_env():
@@ -31,63 +43,82 @@ def get_credentials_from_env():
     pw = os.environ.get("KABU_PW")
     return id_, pw
 
-def make_session_with_retries():
+def make_session_with_retries(pool_size=MAX_WORKERS):
     s = requests.Session()
     retries = Retry(total=3, backoff_factor=0.5,
                     status_forcelist=[429, 500, 502, 503, 504],
                     allowed_methods=["GET", "POST"])
-    s.mount("https://", HTTPAdapter(max_retries=retries))
+    # 並列ダウンロードで接続を使い回せるようプールサイズを合わせる
+    s.mount("https://", HTTPAdapter(max_retries=retries,
+                                   pool_connections=pool_size, pool_maxsize=pool_size))
     s.headers.update({
         "User-Agent": "momentum-downloader/1.1 (+https://yourdomain.example)"
     })
     return s
 
-def download_csv_for_date(target_date, session, id_, pw):
+def download_csv_for_date(target_date, session, id_, pw, base_url, save_dir, prefix):
     """特定日付のCSVをダウンロード"""
-    os.makedirs(SAVE_DIR, exist_ok=True)
     date_str = target_date.strftime("%Y%m%d")
-    url = f"{BASE_URL}_{date_str}.csv"
-    filename = f"tosho-index-data_{date_str}.csv"
-    save_path_tmp = os.path.join(SAVE_DIR, filename + ".part")
-    save_path = os.path.join(SAVE_DIR, filename)
+    url = f"{base_url}_{date_str}.csv"
+    filename = f"{prefix}_{date_str}.csv"
+    save_path = os.path.join(save_dir, filename)
 
-    print(f"📥 {date_str} のCSVをダウンロード中...")
+    print(f"📥 {prefix} {date_str} のCSVをダウンロード中...")
 
+    auth = (id_, pw) if id_ and pw else None
     try:
-        if id_ and pw:
-            res = session.get(url, auth=(id_, pw), timeout=TIMEOUT)
-        else:
-            res = session.get(url, timeout=TIMEOUT)
-    except requests.RequestException as e:
-        print(f"❌ {date_str}: リクエストエラー {e}")
+        # .part にストリーム保存し、受信しきったものだけをリネーム
+        status, res = fetch_to_file(session, url, save_path, auth=auth, timeout=TIMEOUT)
+    except (requests.RequestException, IOError) as e:
+        print(f"❌ {prefix} {date_str}: リクエストエラー {e}")
         return False
 
-    if res.status_code == 200:
-        with open(save_path_tmp, "wb") as f:
-            f.write(res.content)
-        os.replace(save_path_tmp, save_path)
-        print(f"✅ {date_str}: 保存完了 → {save_path}")
+    if status in ("not_modified", "unchanged"):
+        print(f"⏭ {prefix} {date_str}: 変更なし → {save_path}")
         return True
-    elif res.status_code == 404:
-        print(f"⚠️ {date_str}: データが存在しません (404)")
+    if status == "downloaded":
+        print(f"✅ {prefix} {date_str}: 保存完了 → {save_path}")
+        try:
+            build_cache(save_path)
+        except Exception as e:
+            print(f"⚠️ {prefix} {date_str}: キャッシュ作成に失敗 {e}")
+        return True
+    if res.status_code == 404:
+        print(f"⚠️ {prefix} {date_str}: データが存在しません (404)")
     elif res.status_code == 401:
-        print(f"❌ {date_str}: 認証エラー (401)")
+        print(f"❌ {prefix} {date_str}: 認証エラー (401)")
     else:
-        print(f"❌ {date_str}: ダウンロード失敗 (HTTP {res.status_code})")
+        print(f"❌ {prefix} {date_str}: ダウンロード失敗 (HTTP {res.status_code})")
     return False
 
-def download_past_n_days(n_days):
-    """過去n日分を順にダウンロード"""
+def download_past_n_days(n_days, max_workers=MAX_WORKERS):
+    """過去n営業日分（土日祝・年末年始を除く）のうち、未取得のものだけ並列ダウンロード"""
     id_, pw = get_credentials_from_env()
-    session = make_session_with_retries()
+    session = make_session_with_retries(max_workers)
+
+    targets = []
+    for target_date in business_days(datetime.date.today(), n_days):
+        date_str = target_date.strftime("%Y%m%d")
+        for base_url, save_dir, prefix in DATASETS:
+            os.makedirs(save_dir, exist_ok=True)
+            save_path = os.path.join(save_dir, f"{prefix}_{date_str}.csv")
+            if os.path.exists(save_path) or is_archived(save_path):
+                continue  # 取得済み（月別アーカイブに移したものも含む）
+            targets.append((target_date, base_url, save_dir, prefix))
 
-    today = datetime.date.today()
-    for i in range(n_days):
-        target_date = today - datetime.timedelta(days=i)
-        download_csv_for_date(target_date, session, id_, pw)
+    print(f"🗂 取得対象 {len(targets)} ファイル（取得済みはスキップ）")
+    start = time.perf_counter()
+    ok = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(download_csv_for_date, d, session, id_, pw, url, save_dir, prefix)
+                   for d, url, save_dir, prefix in targets]
+        for future in as_completed(futures):
+            ok += bool(future.result())
+    elapsed = time.perf_counter() - start
+    print(f"⏱ {ok}/{len(targets)} ファイルを {elapsed:.1f} 秒で取得")
 
 if __name__ == "__main__":
-    # コマンドライン引数で日数を指定（例: python csv_downloader_multi.py 7）
+    # コマンドライン引数で営業日数を指定（例: python csv_downloader_multi.py 7）
     if len(sys.argv) >= 2:
         try:
             n = int(sys.argv[1])
@@ -1,14 +1,13 @@
 import os
 import csv
-import time
-import gspread
-from google.oauth2.service_account import Credentials
 import pandas as pd
+from keyed_merge import KeyIndex
+from sheets_client import open_worksheet
+import rate_limit
 
 # ==============================
 # 設定
 # ==============================
-SERVICE_ACCOUNT_FILE = "credentials.json"
 SPREADSHEET_ID = "1CTRQdjsgFsRPgRdsT_c_rJheztivNAa1gyTKjxL-QR4"
 
 # データ格納ディレクトリ
@@ -19,20 +18,11 @@ BASE_MOMENTUM_DIR = "data/processed_data/momentum_summary"
 SECTOR_SHEET_NAME = "sector_log"
 MOMENTUM_SHEET_NAME = "momentum_log"
 
-# ==============================
-# Google認証
-# ==============================
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
-creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-gc = gspread.authorize(creds)
-sh = gc.open_by_key(SPREADSHEET_ID)
-
-
 # ==============================
 # 新データをヘッダー直下に挿入
 # ==============================
-def upload_csvs_to_sheet(base_dir, sheet_name, key_cols):
-    worksheet = sh.worksheet(sheet_name)
+def upload_csvs_to_sheet(base_dir, sheet_name, key_cols=None):
+    worksheet = open_worksheet(sheet_name, SPREADSHEET_ID)
 
     print(f"\n📥 {sheet_name} の既存データを取得中...")
     existing_data = worksheet.get_all_values()
@@ -45,6 +35,9 @@ def upload_csvs_to_sheet(base_dir, sheet_name, key_cols):
 
     print(f"➡ 既存 {len(existing_df)} 行を確認済み")
 
+    # 既存キーの索引（正規化は最初の1回だけ、以降は追加行の分だけ更新）
+    key_index = KeyIndex(existing_df, key_cols)
+
     # --- CSVファイル一覧（古い順） ---
     csv_files = sorted(os.listdir(base_dir))
     added_total = 0
@@ -62,19 +55,9 @@ def upload_csvs_to_sheet(base_dir, sheet_name, key_cols):
         except UnicodeDecodeError:
             df_new = pd.read_csv(csv_path, encoding="utf-8-sig")
 
-        # --- 日付文字列を統一（ゼロ埋めやスラッシュ差異を吸収） ---
-        if "日付" in df_new.columns:
-            df_new["日付"] = pd.to_datetime(df_new["日付"], errors="coerce").dt.strftime("%Y-%m-%d")
-        if not existing_df.empty and "日付" in existing_df.columns:
-            existing_df["日付"] = pd.to_datetime(existing_df["日付"], errors="coerce").dt.strftime("%Y-%m-%d")
-
-        # --- 重複除外 ---
+        # --- 重複除外（日付の表記ゆれは索引側で吸収） ---
         before_count = len(df_new)
-        if not existing_df.empty:
-            existing_keys = set(zip(existing_df[key_cols[0]], existing_df[key_cols[1]]))
-            df_new = df_new[
-                ~df_new.apply(lambda r: (r[key_cols[0]], r[key_cols[1]]) in existing_keys, axis=1)
-            ]
+        df_new = key_index.merge(df_new)
         after_count = len(df_new)
 
         if after_count == 0:
@@ -95,9 +78,6 @@ def upload_csvs_to_sheet(base_dir, sheet_name, key_cols):
         # --- 次回の重複判定のために更新 ---
         existing_df = updated_df.copy()
 
-        # --- API負荷軽減 ---
-        time.sleep(1)
-
     print(f"\n🎉 {sheet_name} 更新完了：合計 {added_total} 行追加")
 
 
@@ -105,11 +85,11 @@ def upload_csvs_to_sheet(base_dir, sheet_name, key_cols):
 # メイン処理
 # ==============================
 if __name__ == "__main__":
-    # sector_log（日付＋業種をキーに判定）
+    # sector_log（日付＋業種＋時価総額帯をキーに判定）
     upload_csvs_to_sheet(
         base_dir=BASE_SECTOR_DIR,
         sheet_name=SECTOR_SHEET_NAME,
-        key_cols=["日付", "業種"]
+        key_cols=["日付", "業種", "時価総額帯"]
     )
 
     # momentum_log（日付＋業種をキーに判定）
@@ -119,4 +99,5 @@ if __name__ == "__main__":
         key_cols=["日付", "業種"]
     )
 
-    print("\n🚀 全シート更新完了！")
\ No newline at end of file
+    print("\n🚀 全シート更新完了！")
+    print(f"⏱ API 呼び出し: {rate_limit.format_stats()}")
\ No newline at end of file
@@ -1,15 +1,13 @@
 # -*- coding: utf-8 -*-
 import pandas as pd
 import gspread
-from google.oauth2.service_account import Credentials
 from industry_name_mapping import industry_name_mapping
-import time
+from sheets_client import open_worksheet
+import rate_limit
 
 # ==============================
 # Googleスプレッドシート設定
 # ==============================
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
-SERVICE_ACCOUNT_FILE = "credentials.json"
 SPREADSHEET_ID = "1CTRQdjsgFsRPgRdsT_c_rJheztivNAa1gyTKjxL-QR4"
 
 SECTOR_LOG_SHEET = "sector_log"
@@ -28,38 +26,50 @@ SECTOR_ORDER = [
     "銀行業", "証券、商品先物取引業", "保険業", "その他金融業", "不動産業", "サービス業"
 ]
 
-# ==============================
-# Google認証
-# ==============================
-creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-gc = gspread.authorize(creds)
-sh = gc.open_by_key(SPREADSHEET_ID)
-
 # ==============================
 # 共通関数
 # ==============================
 def get_sheet_dataframe(sheet_name):
-    ws = sh.worksheet(sheet_name)
+    ws = open_worksheet(sheet_name, SPREADSHEET_ID)
     data = ws.get_all_values()
     if not data:
         return pd.DataFrame()
     return pd.DataFrame(data[1:], columns=data[0])
 
-def get_column_index_by_header(ws, header_row, value):
-    """ヘッダー行に value があれば列番号返す。なければ最後に追加して列番号返す"""
+def assign_date_columns(ws, header_row, dates):
+    """
+    ヘッダー行を1回だけ読み、各日付の列番号を決める（無い日付は右端に順に追加）
+    戻り値: ({日付: 列番号}, 新しく追加する日付のリスト)
+    """
     headers = ws.row_values(header_row)
-    if value in headers:
-        return headers.index(value) + 1
-    else:
-        col_index = len(headers) + 1
-        ws.update_cell(header_row, col_index, value)
-        return col_index
+    columns, new_dates = {}, []
+    for date in dates:
+        if date in headers:
+            columns[date] = headers.index(date) + 1
+        else:
+            columns[date] = len(headers) + len(new_dates) + 1
+            new_dates.append(date)
+    return columns, new_dates
+
+def column_range(start_row, col_index, n_rows):
+    """1列分のA1レンジ（例: C3:C35）"""
+    return (f"{gspread.utils.rowcol_to_a1(start_row, col_index)}:"
+            f"{gspread.utils.rowcol_to_a1(start_row + n_rows - 1, col_index)}")
+
+def column_values(series):
+    """列書き込み用の [[v], [v], ...]（欠損は空欄）"""
+    return [["" if pd.isna(v) else v] for v in series.tolist()]
+
+def header_updates(columns, new_dates, header_row):
+    """追加する日付のヘッダーセル"""
+    return [{"range": gspread.utils.rowcol_to_a1(header_row, columns[date]), "values": [[date]]}
+            for date in new_dates]
 
 # ==============================
 # SECTOR_RANKING 更新（過去N日分）
 # ==============================
 def append_sector_ranking_Ndays(N=5):
-    ws = sh.worksheet(SECTOR_RANKING_SHEET)
+    ws = open_worksheet(SECTOR_RANKING_SHEET, SPREADSHEET_ID)
     df = get_sheet_dataframe(SECTOR_LOG_SHEET)
     df["業種"] = df["業種"].map(industry_name_mapping).fillna(df["業種"])
     df["時価総額加重平均騰落率"] = pd.to_numeric(
@@ -68,28 +78,30 @@ def append_sector_ranking_Ndays(N=5):
     )
 
     last_dates = sorted(df["日付"].unique())[-N:]
+    if not last_dates:
+        return
+    columns, new_dates = assign_date_columns(ws, 2, last_dates)  # 2行目ヘッダー
+
+    # 日付×業種の表をまとめて作成（1日ずつ集計しない）
+    df_recent = df[df["日付"].isin(last_dates)].dropna(subset=["時価総額加重平均騰落率"])
+    pivot = df_recent.pivot_table(index="業種", columns="日付", values="時価総額加重平均騰落率", aggfunc="mean")
+    pivot = pivot.reindex(index=SECTOR_ORDER, columns=last_dates)
 
     start_row = 3  # データ開始行
+    data = header_updates(columns, new_dates, 2)
     for date in last_dates:
-        col_index = get_column_index_by_header(ws, 2, date)  # 2行目ヘッダー
+        data.append({"range": column_range(start_row, columns[date], len(SECTOR_ORDER)),
+                     "values": column_values(pivot[date])})
 
-        df_date = df[df["日付"] == date].dropna(subset=["時価総額加重平均騰落率"])
-        df_date = df_date.groupby("業種", as_index=False)["時価総額加重平均騰落率"].mean()
-        df_date = df_date.set_index("業種").reindex(SECTOR_ORDER)
-        values = [[v] for v in df_date["時価総額加重平均騰落率"].tolist()]
-
-        # 列を動的に指定してまとめて書き込む
-        ws.update(f"{gspread.utils.rowcol_to_a1(start_row, col_index)}:"
-                  f"{gspread.utils.rowcol_to_a1(start_row + len(SECTOR_ORDER) - 1, col_index)}",
-                  values)
-        print(f"✅ {date} を sector_ranking に追記しました")
-        time.sleep(3)  # API制限回避
+    # ヘッダーと全日付の列を1回の batch_update で書き込む
+    ws.batch_update(data, value_input_option="RAW")
+    print(f"✅ {len(last_dates)} 日分（{last_dates[0]}〜{last_dates[-1]}）を sector_ranking に追記しました")
 
 # ==============================
 # MOMENTUM_FLOW 更新（過去N日分）
 # ==============================
 def append_momentum_flow_Ndays(N=5):
-    ws = sh.worksheet(MOMENTUM_FLOW_SHEET)
+    ws = open_worksheet(MOMENTUM_FLOW_SHEET, SPREADSHEET_ID)
     df = get_sheet_dataframe(MOMENTUM_LOG_SHEET)
     df["業種"] = df["業種"].map(industry_name_mapping).fillna(df["業種"])
 
@@ -101,29 +113,24 @@ def append_momentum_flow_Ndays(N=5):
         )
 
     last_dates = sorted(df["日付"].unique())[-N:]
+    if not last_dates:
+        return
+    columns, new_dates = assign_date_columns(ws, 2, last_dates)  # 2行目ヘッダー
 
     start_row_5_20 = 3
     start_row_3_10 = start_row_5_20 + len(SECTOR_ORDER) + 4
 
+    data = header_updates(columns, new_dates, 2)
     for date in last_dates:
-        col_index = get_column_index_by_header(ws, 2, date)  # 2行目ヘッダー
-
-        df_date = df[df["日付"] == date].dropna(subset=ratio_cols)
-
-        latest_5_20 = df_date[["業種", "売買代金5日平均/20日平均比率"]].set_index("業種").reindex(SECTOR_ORDER)
-        values_5_20 = [[v] for v in latest_5_20["売買代金5日平均/20日平均比率"].tolist()]
-        ws.update(f"{gspread.utils.rowcol_to_a1(start_row_5_20, col_index)}:"
-                  f"{gspread.utils.rowcol_to_a1(start_row_5_20 + len(SECTOR_ORDER) - 1, col_index)}",
-                  values_5_20)
-
-        latest_3_10 = df_date[["業種", "売買代金3日平均/10日平均比率"]].set_index("業種").reindex(SECTOR_ORDER)
-        values_3_10 = [[v] for v in latest_3_10["売買代金3日平均/10日平均比率"].tolist()]
-        ws.update(f"{gspread.utils.rowcol_to_a1(start_row_3_10, col_index)}:"
-                  f"{gspread.utils.rowcol_to_a1(start_row_3_10 + len(SECTOR_ORDER) - 1, col_index)}",
-                  values_3_10)
+        df_date = df[df["日付"] == date].dropna(subset=ratio_cols).set_index("業種").reindex(SECTOR_ORDER)
+        data.append({"range": column_range(start_row_5_20, columns[date], len(SECTOR_ORDER)),
+                     "values": column_values(df_date["売買代金5日平均/20日平均比率"])})
+        data.append({"range": column_range(start_row_3_10, columns[date], len(SECTOR_ORDER)),
+                     "values": column_values(df_date["売買代金3日平均/10日平均比率"])})
 
-        print(f"✅ {date} を momentum_flow に追記しました")
-        time.sleep(3)  # API制限回避
+    # ヘッダーと 5/20・3/10 の全列を1回の batch_update で書き込む
+    ws.batch_update(data, value_input_option="RAW")
+    print(f"✅ {len(last_dates)} 日分（{last_dates[0]}〜{last_dates[-1]}）を momentum_flow に追記しました")
 
 # ==============================
 # メイン処理
@@ -132,4 +139,5 @@ if __name__ == "__main__":
     N = 20  # 過去N日分を右端に追加
     append_sector_ranking_Ndays(N)
     append_momentum_flow_Ndays(N)
-    print("全シート更新完了！")
\ No newline at end of file
+    print("全シート更新完了！")
+    print(f"⏱ API 呼び出し: {rate_limit.format_stats()}")
\ No newline at end of file
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+
+# ==============================
+# 日次の業種間順位
+# ==============================
+def daily_ranks(df, value_col, key_col="業種", date_col="日付", ascending=False):
+    """
+    日付×業種の順位表（行=日付の昇順、列=業種）を1回で作成
+    ascending=False なら値の大きい順に 1, 2, ...（同値は同順位）
+    その日にデータが無い業種・値が NaN の業種は NaN
+    """
+    values = df.pivot_table(index=date_col, columns=key_col, values=value_col, aggfunc="mean", dropna=False)
+    values = values.sort_index()
+    return values.rank(axis=1, ascending=ascending, method="min")
+
+
+# ==============================
+# 連続日数（ランレングス）
+# ==============================
+def run_lengths(flags):
+    """
+    日付×業種の bool 表から、各日時点で True が何日連続しているかを累積演算で計算
+    例: [T, T, F, T, T, T] → [1, 2, 0, 1, 2, 3]
+    """
+    flags = flags.eq(True)  # NaN は False
+    counts = flags.cumsum()
+    # False の日の累積値を前方に埋め、そこからの増分を連続日数とする
+    last_reset = counts.where(~flags).ffill().fillna(0)
+    return (counts - last_reset).astype(int)
+
+
+def rank_streaks(ranks, n=5):
+    """順位表から「上位 n 位以内」の連続日数表を作成（n を変えても順位の再計算は不要）"""
+    return run_lengths(ranks <= n)
+
+
+def latest_streaks(df, value_col, key_col="業種", date_col="日付", top_n=True, n=5):
+    """
+    最新日時点で各業種が上位（top_n=False なら下位）n 位以内に何日連続で入っているか
+    戻り値: {業種: 連続日数}
+    """
+    ranks = daily_ranks(df, value_col, key_col, date_col, ascending=not top_n)
+    if ranks.empty:
+        return {}
+    latest = rank_streaks(ranks, n).iloc[-1]
+    return {sector: int(days) for sector, days in latest.items()}
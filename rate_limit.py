@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import time
+import threading
+from requests.adapters import HTTPAdapter
+
+# ==============================
+# 設定
+# ==============================
+# API ごとの 1分あたりの上限
+# - Sheets：ユーザー（サービスアカウント）ごと・1分あたりの読込／書込リクエスト数
+# - Discord：Webhook は 1チャンネルあたり 30 件／分
+# ※ kabu.plus は公開された上限が無いため対象外（同時接続数は各ダウンローダーの MAX_WORKERS で制限）
+QUOTAS_PER_MINUTE = {
+    "sheets_read": 60,
+    "sheets_write": 60,
+    "discord": 30,
+}
+# 補充速度を上限の 90%、一度に使える量（バースト）を残りの 10% にする
+# → どの 60 秒間をとっても「バースト＋補充」が上限を超えない
+SAFETY = 0.9
+
+
+# ==============================
+# トークンバケット
+# ==============================
+class TokenBucket:
+    """
+    トークンバケット（スレッドセーフ）
+    残量があれば待たずに通し、尽きたときだけ補充されるまで待つ
+    """
+
+    def __init__(self, per_minute, safety=SAFETY):
+        self.rate = per_minute * safety / 60.0          # 1秒あたりの補充量
+        self.capacity = max(1.0, round(per_minute * (1 - safety), 6))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        # 計測用
+        self.calls = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+
+    def acquire(self, n=1):
+        """n 個取り出す（足りなければ待つ）。戻り値: 待った秒数"""
+        n = min(n, self.capacity)
+        start = time.monotonic()
+        slept = False
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    break
+                time.sleep((n - self.tokens) / self.rate)
+                slept = True
+            waited = time.monotonic() - start
+            self.calls += 1
+            # 他のスレッドの待機中にロック待ちした分も「制限で待った時間」に含める
+            if slept or waited > 0.01:
+                self.throttled += 1
+                self.wait_seconds += waited
+        return waited
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(name):
+    """API 名のバケット（プロセス内で共通）"""
+    with _buckets_lock:
+        if name not in _buckets:
+            _buckets[name] = TokenBucket(QUOTAS_PER_MINUTE[name])
+        return _buckets[name]
+
+
+def acquire(name, n=1):
+    """API を呼ぶ前に呼ぶ（上限に達していれば補充まで待つ）"""
+    return get_bucket(name).acquire(n)
+
+
+# ==============================
+# 計測
+# ==============================
+def stats():
+    """API 名 → 呼び出し回数・待たされた回数・待った秒数"""
+    return {
+        name: {"calls": b.calls, "throttled": b.throttled, "wait_seconds": round(b.wait_seconds, 3)}
+        for name, b in _buckets.items()
+    }
+
+
+def format_stats():
+    """ログ出力用の1行（呼び出しが無ければ空文字）"""
+    return ", ".join(
+        f"{name} {s['calls']}回（待機 {s['throttled']}回・{s['wait_seconds']:.1f}秒）"
+        for name, s in stats().items() if s["calls"]
+    )
+
+
+# ==============================
+# requests 用アダプタ
+# ==============================
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    送信前にバケットからトークンを取る HTTPAdapter（Retry などの引数は HTTPAdapter と同じ）
+    bucket: API 名、または PreparedRequest を受けて API 名を返す関数
+    ※ max_retries（urllib3 の Retry）による再送はバックオフ・Retry-After で間隔を空けるため、トークンは取らない
+    """
+
+    def __init__(self, bucket, **kwargs):
+        self.bucket = bucket
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        acquire(self.bucket(request) if callable(self.bucket) else self.bucket)
+        return super().send(request, **kwargs)
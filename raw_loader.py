@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+from pathlib import Path
+from industry_name_mapping import industry_name_mapping
+import monthly_archive
+
+try:
+    import pyarrow  # noqa: F401  Parquet キャッシュ用（無ければ CSV を直接読む）
+except ImportError:
+    pyarrow = None
+
+# ==============================
+# 設定
+# ==============================
+RAW_DIR = Path("data/raw")
+CACHE_DIR = Path("data/cache")  # data/raw と同じサブフォルダ構成で .parquet を置く
+
+# ==============================
+# スキーマ（kabu.plus）
+# ==============================
+# 全銘柄株価一覧：集計で使う金額・騰落率は float64（合計が誤差なく一致するように）、
+# 参考値の株価系は float32 に縮小
+STOCK_DTYPES = {
+    "SC": "string",
+    "名称": "string",
+    "市場": "category",
+    "業種": "category",
+    "日付": "string",
+    "株価": "float32",
+    "前日比": "float64",
+    "前日比（％）": "float64",
+    "前日終値": "float32",
+    "始値": "float32",
+    "高値": "float32",
+    "安値": "float32",
+    "出来高": "float64",
+    "売買代金（千円）": "float64",
+    "時価総額（百万円）": "float64",
+    "値幅下限": "float32",
+    "値幅上限": "float32",
+}
+# 業種別集計で使う列（「-」は 0 として扱う）
+STOCK_ZERO_FILL_COLUMNS = ["前日比", "売買代金（千円）", "時価総額（百万円）"]
+
+# 東証指数データ
+INDEX_DTYPES = {
+    "SC": "string",
+    "指数名": "string",
+    "日付": "string",
+    "終値": "float64",
+    "前日比": "float64",
+    "前日比（％）": "float64",
+    "前日終値": "float64",
+    "時価総額（指数用・浮動株ベース）": "float64",
+    "時価総額前日比": "float64",
+    "前日時価総額": "float64",
+    "平均時価総額": "float64",
+    "基準時価総額": "float64",
+    "銘柄数": "float32",
+    "売買単位換算後株式数": "float64",
+}
+
+DATE_FORMAT = "%Y%m%d"
+NA_VALUES = ["-"]
+
+
+# ==============================
+# キャッシュパス
+# ==============================
+def cache_path_for(csv_path):
+    """data/raw/<sub>/<name>.csv → data/cache/<sub>/<name>.parquet"""
+    csv_path = Path(csv_path)
+    try:
+        relative = csv_path.relative_to(RAW_DIR)
+    except ValueError:
+        relative = Path(csv_path.parent.name) / csv_path.name
+    return (CACHE_DIR / relative).with_suffix(".parquet")
+
+
+def _cache_is_fresh(csv_path, cache_path):
+    if not cache_path.exists():
+        return False
+    if not csv_path.exists():
+        return True  # 生CSVが削除済みでもキャッシュは使える
+    return cache_path.stat().st_mtime >= csv_path.stat().st_mtime
+
+
+def list_raw_files(directory, pattern):
+    """生CSVの一覧（月別アーカイブに移したものも含む、名前順）"""
+    return monthly_archive.list_files(directory, pattern)
+
+
+# ==============================
+# CSV の読込・整形
+# ==============================
+def _read_csv(csv_path, dtypes, columns=None):
+    """
+    スキーマ付きで CSV を読込
+    columns を指定した場合は必要な列だけをパース（usecols）
+    生CSVが月別アーカイブに移されていればアーカイブから読む
+    """
+    usecols = None
+    if columns is not None:
+        usecols = lambda c: c in columns
+    source = csv_path if Path(csv_path).exists() else monthly_archive.open_member(csv_path)
+    return pd.read_csv(
+        source,
+        encoding="cp932",
+        usecols=usecols,
+        dtype=dtypes,
+        thousands=",",
+        na_values=NA_VALUES,
+    )
+
+
+def _map_categories(series, mapping):
+    """category のカテゴリ名にだけ名称マッピングを適用（行ごとの置換はしない）"""
+    categories = series.cat.categories
+    mapped = categories.map(lambda c: mapping.get(c, c))
+    if mapped.is_unique:
+        series = series.cat.rename_categories(mapped)
+    else:
+        series = series.astype(object).replace(mapping).astype("category")
+    series = series.cat.remove_unused_categories()
+    return series.cat.reorder_categories(sorted(series.cat.categories))
+
+
+def clean_stock_prices(df):
+    """
+    全銘柄株価一覧（kabu.plus）を整形
+    - 「株価指数」行を除外、業種名を統一（カテゴリ名に対して1回だけ）
+    - 集計列の「-」は 0
+    - 日付は datetime
+    """
+    if "業種" in df.columns:
+        df = df[df["業種"] != "株価指数"].copy()
+        df["業種"] = _map_categories(df["業種"], industry_name_mapping)
+
+    for col in STOCK_ZERO_FILL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].fillna(0)
+
+    if "日付" in df.columns:
+        df["日付"] = pd.to_datetime(df["日付"].str.strip(), format=DATE_FORMAT, errors="coerce")
+    return df.reset_index(drop=True)
+
+
+def clean_index_data(df):
+    """東証指数データを整形（日付は datetime）"""
+    if "日付" in df.columns:
+        df["日付"] = pd.to_datetime(df["日付"].str.strip(), format=DATE_FORMAT, errors="coerce")
+    return df
+
+
+STOCK_SCHEMA = (STOCK_DTYPES, clean_stock_prices)
+INDEX_SCHEMA = (INDEX_DTYPES, clean_index_data)
+
+
+def _read_raw_csv(csv_path, schema, columns=None):
+    dtypes, cleaner = schema
+    return cleaner(_read_csv(csv_path, dtypes, columns))
+
+
+# ==============================
+# キャッシュ作成・読込
+# ==============================
+def _write_cache(df, cache_path):
+    """一時ファイルに書いてからリネーム（途中で落ちても壊れない）"""
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(cache_path.name + ".part")
+    df.to_parquet(tmp_path, index=False)
+    tmp_path.replace(cache_path)
+
+
+def build_cache(csv_path, schema=None):
+    """
+    生CSVを整形して Parquet キャッシュに保存（ダウンロード直後に呼ぶ）
+    pyarrow が無い環境では何もしない
+    """
+    csv_path = Path(csv_path)
+    if pyarrow is None:
+        return None
+    if schema is None:
+        schema = INDEX_SCHEMA if "tosho-index-data" in csv_path.name else STOCK_SCHEMA
+
+    cache_path = cache_path_for(csv_path)
+    _write_cache(_read_raw_csv(csv_path, schema), cache_path)
+    return cache_path
+
+
+def _load(csv_path, schema, columns=None):
+    csv_path = Path(csv_path)
+    cache_path = cache_path_for(csv_path)
+    if pyarrow is not None and _cache_is_fresh(csv_path, cache_path):
+        try:
+            return pd.read_parquet(cache_path, columns=columns)
+        except Exception as e:
+            print(f"⚠️ キャッシュ読込に失敗したため CSV を読みます: {cache_path} ({e})")
+
+    if pyarrow is None:
+        # キャッシュを作れない環境では必要な列だけパース
+        return _read_raw_csv(csv_path, schema, columns)
+
+    df = _read_raw_csv(csv_path, schema)
+    try:
+        _write_cache(df, cache_path)
+    except Exception as e:
+        print(f"⚠️ キャッシュ作成に失敗: {cache_path} ({e})")
+    return df if columns is None else df[columns]
+
+
+def load_stock_prices(csv_path, columns=None):
+    """
+    全銘柄株価一覧を読込（キャッシュがあれば Parquet、無ければ CSV を整形してキャッシュ）
+    columns: 必要な列だけ読む場合に指定（例: ["日付", "業種", "売買代金（千円）"]）
+    """
+    return _load(csv_path, STOCK_SCHEMA, columns)
+
+
+def load_index_data(csv_path, columns=None):
+    """東証指数データを読込（キャッシュがあれば Parquet、無ければ CSV を整形してキャッシュ）"""
+    return _load(csv_path, INDEX_SCHEMA, columns)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+# ==============================
+# 時価総額帯（百万円）
+# ==============================
+MARKET_CAP_BINS = [10_000, 100_000, 1_000_000]
+MARKET_CAP_LABELS = ["小型", "中型", "大型", "超大型"]
+
+# 集計に必要な入力列（raw_loader の columns に渡す）
+STOCK_INPUT_COLUMNS = ["市場", "業種", "前日比", "前日比（％）", "売買代金（千円）", "時価総額（百万円）"]
+INDEX_INPUT_COLUMNS = ["指数名", "前日比（％）"]
+
+SECTOR_COLUMNS = ["日付", "業種", "時価総額帯", "上昇銘柄数", "下落銘柄数", "時価総額加重平均騰落率", "売買代金合計"]
+
+# 複数の集計単位（group_summary）：最も細かい区分と、既定で出力する集計単位（キー列の組。[] は全市場）
+GROUP_DIMENSIONS = ["市場", "業種", "時価総額帯"]
+DEFAULT_GROUPINGS = [[], ["市場"], ["市場", "業種"], ["業種", "時価総額帯"]]
+GROUP_TOTAL_LABEL = "全体"  # 集計単位に含まれないキー列の値
+GROUP_MEASURES = ["銘柄数", "上昇銘柄数", "下落銘柄数", "加重騰落率", "時価総額", "売買代金合計"]
+GROUP_COLUMNS = ["日付", "集計単位"] + GROUP_DIMENSIONS + [
+    "銘柄数", "上昇銘柄数", "下落銘柄数", "時価総額加重平均騰落率", "売買代金合計"
+]
+
+
+def classify_market_cap(market_cap):
+    """
+    時価総額（百万円）の Series を時価総額帯に一括分類
+    境界は従来どおり「未満」で判定（NaN は「超大型」に入る点も従来と同じ）
+    """
+    codes = np.searchsorted(MARKET_CAP_BINS, market_cap.to_numpy(dtype=float), side="right")
+    return pd.Series(np.asarray(MARKET_CAP_LABELS, dtype=object)[codes], index=market_cap.index)
+
+
+# ==============================
+# sector_summary 集計
+# ==============================
+def aggregate_sector(stock_df, index_df, date_slash):
+    """
+    業種×時価総額帯を1回の groupby().agg で集計し、「全体」行も同じ集計結果から作成
+    「全体」の騰落率は index_df（指数名＝業種名）と1回の結合で取得
+    stock_df: 「時価総額帯」「上昇フラグ」「下落フラグ」を付与済みの個別銘柄 DataFrame
+    """
+    band = (
+        stock_df.assign(加重騰落率=stock_df["前日比（％）"] * stock_df["時価総額（百万円）"])
+        .groupby(["業種", "時価総額帯"], sort=True, observed=True)
+        .agg(
+            上昇銘柄数=("上昇フラグ", "sum"),
+            下落銘柄数=("下落フラグ", "sum"),
+            加重騰落率=("加重騰落率", "sum"),
+            時価総額=("時価総額（百万円）", "sum"),
+            売買代金合計=("売買代金（千円）", "sum"),
+        )
+        .reset_index()
+    )
+    band["業種"] = band["業種"].astype(object)
+    band["日付"] = date_slash
+    band["上昇銘柄数"] = band["上昇銘柄数"].astype("int64")
+    band["下落銘柄数"] = band["下落銘柄数"].astype("int64")
+    band["売買代金合計"] = band["売買代金合計"].astype("int64")
+    band["時価総額加重平均騰落率"] = (band["加重騰落率"] / band["時価総額"].clip(lower=1)).round(3)
+
+    # 全体行（帯ごとの集計をさらに業種で合算）
+    total = band.groupby("業種", sort=True)[["上昇銘柄数", "下落銘柄数", "売買代金合計"]].sum().reset_index()
+    total["日付"] = date_slash
+    total["時価総額帯"] = "全体"
+
+    # 全体区分の平均騰落率を index_df から取得（同名の指数が複数あれば先頭行、無ければ 0）
+    index_rate = index_df.drop_duplicates("指数名").set_index("指数名")["前日比（％）"].astype(float)
+    matched = total["業種"].isin(index_rate.index)
+    total["時価総額加重平均騰落率"] = total["業種"].map(index_rate).where(matched, 0.0)
+
+    return pd.concat([band[SECTOR_COLUMNS], total[SECTOR_COLUMNS]], ignore_index=True)
+
+
+# ==============================
+# 複数の集計単位（group_summary）
+# ==============================
+def aggregate_groups(stock_df, date_slash, groupings=DEFAULT_GROUPINGS):
+    """
+    複数の集計単位を、銘柄を1回だけ走査して集計し縦持ち（long 形式）で返す
+    - 市場×業種×時価総額帯 の小計を1回の groupby().agg で作り、各集計単位はその小計（数百行）を合算
+      （集計単位を増やしても銘柄の再走査は発生しない）
+    - 集計単位に含まれないキー列は「全体」、集計単位名はキー列を「×」でつないだもの（[] は「全市場」）
+    - 騰落率は stock_df からの時価総額加重平均（sector_summary の「全体」行のような指数値は使わない）
+    stock_df: 「時価総額帯」「上昇フラグ」「下落フラグ」を付与済みの個別銘柄 DataFrame
+    """
+    cells = (
+        stock_df.assign(加重騰落率=stock_df["前日比（％）"] * stock_df["時価総額（百万円）"])
+        .groupby(GROUP_DIMENSIONS, sort=True, observed=True)
+        .agg(
+            銘柄数=("上昇フラグ", "size"),
+            上昇銘柄数=("上昇フラグ", "sum"),
+            下落銘柄数=("下落フラグ", "sum"),
+            加重騰落率=("加重騰落率", "sum"),
+            時価総額=("時価総額（百万円）", "sum"),
+            売買代金合計=("売買代金（千円）", "sum"),
+        )
+        .reset_index()
+    )
+    for col in GROUP_DIMENSIONS:
+        cells[col] = cells[col].astype(object)
+
+    frames = []
+    for keys in groupings:
+        keys = list(keys)
+        if keys:
+            part = cells.groupby(keys, sort=True)[GROUP_MEASURES].sum().reset_index()
+        else:
+            part = cells[GROUP_MEASURES].sum().to_frame().T
+        for col in GROUP_DIMENSIONS:
+            if col not in keys:
+                part[col] = GROUP_TOTAL_LABEL
+        part["集計単位"] = "×".join(keys) or "全市場"
+        frames.append(part)
+
+    groups = pd.concat(frames, ignore_index=True)
+    groups["日付"] = date_slash
+    for col in ["銘柄数", "上昇銘柄数", "下落銘柄数", "売買代金合計"]:
+        groups[col] = groups[col].astype("int64")
+    groups["時価総額加重平均騰落率"] = (
+        groups["加重騰落率"].astype(float) / groups["時価総額"].astype(float).clip(lower=1)
+    ).round(3)
+    return groups[GROUP_COLUMNS]
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import json
+import datetime
+import gspread
+from pathlib import Path
+from google.oauth2.service_account import Credentials
+from google.auth.transport.requests import Request
+from urllib3.util.retry import Retry
+from rate_limit import RateLimitedAdapter
+
+# ==============================
+# Googleスプレッドシート設定
+# ==============================
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+SERVICE_ACCOUNT_FILE = "credentials.json"
+SPREADSHEET_ID = "1CTRQdjsgFsRPgRdsT_c_rJheztivNAa1gyTKjxL-QR4"
+
+# アクセストークンの保存先（有効期限内なら次回の実行でも認証を省略）
+# ※ data/ はワークフローでコミットされるため、リポジトリの外に置く（環境変数 SHEETS_TOKEN_CACHE で変更可）
+TOKEN_CACHE_FILE = Path(os.environ.get(
+    "SHEETS_TOKEN_CACHE", Path.home() / ".cache" / "momentum-detector" / "sheets_token.json"))
+TOKEN_MIN_TTL = datetime.timedelta(minutes=5)  # 残りがこれ未満なら取り直す
+# ワークシートのメタデータ（sheetId・タイトル・行列数）の保存先（次回の実行・別プロセスのステージでも再利用）
+METADATA_CACHE_FILE = TOKEN_CACHE_FILE.with_name("sheets_metadata.json")
+
+# 429（クォータ超過）・5xx の再試行：指数バックオフ（2, 4, 8, 16, 32 秒）、Retry-After があればそちらを優先
+RETRY_TOTAL = 6
+RETRY_BACKOFF = 2
+RETRY_STATUS = [429, 500, 502, 503, 504]
+
+# プロセス内で1回だけ認証し、各ステージで使い回す
+_client = None
+_spreadsheets = {}
+_worksheets = {}
+
+
+# ==============================
+# アクセストークンのキャッシュ
+# ==============================
+def _utcnow():
+    """google-auth の expiry と同じ naive UTC"""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _load_token(creds, path=TOKEN_CACHE_FILE):
+    """保存済みトークンが同じサービスアカウント・スコープで有効期限内なら creds に設定"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            cached = json.load(f)
+        expiry = datetime.datetime.fromisoformat(cached["expiry"])
+    except (OSError, ValueError, KeyError):
+        return False
+    if cached.get("account") != creds.service_account_email or cached.get("scopes") != SCOPES:
+        return False
+    if expiry - _utcnow() < TOKEN_MIN_TTL:
+        return False
+    creds.token = cached["token"]
+    creds.expiry = expiry
+    return True
+
+
+def _save_token(creds, path=TOKEN_CACHE_FILE):
+    """本人のみ読める権限で一時ファイルに書いてからリネーム"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".part")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({
+            "account": creds.service_account_email,
+            "scopes": SCOPES,
+            "token": creds.token,
+            "expiry": creds.expiry.isoformat(),
+        }, f)
+    tmp_path.replace(path)
+
+
+# ==============================
+# ワークシートのメタデータのキャッシュ
+# ==============================
+def _load_metadata(path=None):
+    """スプレッドシートID → {シート名: properties}"""
+    try:
+        with open(path or METADATA_CACHE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_metadata(metadata, path=None):
+    path = Path(path or METADATA_CACHE_FILE)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".part")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False)
+        tmp_path.replace(path)
+    except OSError as e:
+        print(f"⚠️ シート情報の保存に失敗（次回も取得します）: {e}")
+
+
+def forget_metadata(spreadsheet_id):
+    """保存済みのシート情報を破棄（シートの削除・名前変更などで古くなった場合）"""
+    metadata = _load_metadata()
+    if metadata.pop(spreadsheet_id, None) is not None:
+        _save_metadata(metadata)
+    _spreadsheets.pop(spreadsheet_id, None)
+    for key in [k for k in _worksheets if k[0] == spreadsheet_id]:
+        del _worksheets[key]
+
+
+def _forget_on_error(response, *args, **kwargs):
+    """400（範囲・sheetId の不一致）・404（シートが無い）の応答では、そのスプレッドシートの保存情報を破棄"""
+    if response.status_code in (400, 404):
+        m = re.search(r"/spreadsheets/([^/:?]+)", response.url)
+        if m:
+            forget_metadata(m.group(1))
+    return response
+
+
+# ==============================
+# 流量制限・429/5xx の再試行
+# ==============================
+class SheetsRetry(Retry):
+    """
+    POST（行の挿入など、二重に実行されると結果が変わる操作）は 429 のときだけ再試行
+    送信後の読込タイムアウト・切断はサーバー側で実行済みの可能性があるため再送しない
+    （接続できなかった場合は未送信なので再試行する）
+    """
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method == "POST" and status_code != 429:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if method == "POST" and error is not None and self._is_read_error(error):
+            raise error.with_traceback(_stacktrace)
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+def _sheets_bucket(request):
+    """読込（GET）と書込（PUT/POST）は別々のクォータ"""
+    return "sheets_read" if request.method == "GET" else "sheets_write"
+
+
+def sheets_adapter():
+    """読込／書込クォータの流量制限と再試行を設定した HTTPAdapter"""
+    retries = SheetsRetry(total=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF,
+                          status_forcelist=RETRY_STATUS,
+                          allowed_methods=None,
+                          respect_retry_after_header=True,
+                          raise_on_status=False)
+    return RateLimitedAdapter(_sheets_bucket, max_retries=retries)
+
+
+def _mount_adapter(client):
+    """gspread の HTTP セッション（gspread 6 は client.http_client.session、5 以前は client.session）に設定"""
+    session = getattr(getattr(client, "http_client", client), "session", None)
+    if session is None:
+        return
+    session.mount("https://", sheets_adapter())
+    session.hooks["response"].append(_forget_on_error)
+
+
+# ==============================
+# Google認証（共通）
+# ==============================
+def get_client():
+    """
+    サービスアカウントで認証した gspread クライアントを返す（初回のみ認証）
+    保存済みのアクセストークンが有効なら認証の通信も省略
+    """
+    global _client
+    if _client is None:
+        creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+        if not _load_token(creds):
+            creds.refresh(Request())
+            try:
+                _save_token(creds)
+            except OSError as e:
+                print(f"⚠️ アクセストークンの保存に失敗（次回も認証します）: {e}")
+        _client = gspread.authorize(creds)
+        _mount_adapter(_client)
+    return _client
+
+
+def open_spreadsheet(spreadsheet_id=SPREADSHEET_ID):
+    """スプレッドシートを開く（同じIDは2回目以降キャッシュを返す）"""
+    if spreadsheet_id not in _spreadsheets:
+        _spreadsheets[spreadsheet_id] = get_client().open_by_key(spreadsheet_id)
+    return _spreadsheets[spreadsheet_id]
+
+
+def open_worksheet(sheet_name, spreadsheet_id=SPREADSHEET_ID):
+    """
+    ワークシートを開く（同じシートは2回目以降キャッシュを返す）
+    Spreadsheet.worksheet() は呼ぶたびにメタデータを取得するため、プロセス内で使い回し、
+    シート情報はファイルにも保存して次回の実行・別プロセスのステージでは取得せずに組み立てる
+    """
+    key = (spreadsheet_id, sheet_name)
+    if key not in _worksheets:
+        _worksheets[key] = _cached_worksheet(sheet_name, spreadsheet_id) or _fetch_worksheet(sheet_name, spreadsheet_id)
+    return _worksheets[key]
+
+
+def _cached_worksheet(sheet_name, spreadsheet_id):
+    """保存済みのシート情報から Worksheet を組み立てる（gspread 6 以降・保存情報がある場合のみ）"""
+    properties = _load_metadata().get(spreadsheet_id, {}).get(sheet_name)
+    http_client = getattr(get_client(), "http_client", None)
+    if properties is None or not isinstance(http_client, gspread.http_client.HTTPClient):
+        return None
+    # Worksheet の操作は spreadsheet_id と client だけで動く（Spreadsheet は duplicate() でのみ使用）
+    return gspread.Worksheet(None, properties, spreadsheet_id, http_client)
+
+
+def _fetch_worksheet(sheet_name, spreadsheet_id):
+    """シート情報を取得し、全シート分を保存（次回は _cached_worksheet で組み立てる）"""
+    spreadsheet = open_spreadsheet(spreadsheet_id)
+    if not hasattr(get_client(), "http_client"):
+        return spreadsheet.worksheet(sheet_name)  # gspread 5 以前はプロセス内のキャッシュのみ
+    worksheets = spreadsheet.worksheets()
+    metadata = _load_metadata()
+    metadata[spreadsheet_id] = {ws.title: ws._properties for ws in worksheets}
+    _save_metadata(metadata)
+    for ws in worksheets:
+        if ws.title == sheet_name:
+            return ws
+    raise gspread.exceptions.WorksheetNotFound(sheet_name)
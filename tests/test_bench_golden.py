@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+import bench_suite  # noqa: E402
+
+
+def test_committed_golden_set_matches():
+    assert not bench_suite.missing_golden(bench_suite.GOLDEN_DIR)
+    assert bench_suite.golden_check(bench_suite.GOLDEN_DIR) is True
+
+
+def test_missing_golden_set_fails(tmp_path):
+    (tmp_path / "sector_summary").mkdir()
+    assert bench_suite.golden_check(str(tmp_path)) is False
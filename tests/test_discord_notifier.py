@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from discord_notifier import FENCE, split_message, _in_fence_after
+
+
+def _fence_states(chunk):
+    """チャンク内の各行について (行, 行の後でコードブロック内か)"""
+    states, in_fence = [], False
+    for line in chunk.splitlines():
+        in_fence = _in_fence_after(line, in_fence)
+        states.append((line, in_fence))
+    return states
+
+
+def test_code_block_split_over_three_messages():
+    rows = [f"業種{i:02d} | {i * 1.5:6.2f}% | {i * 1000:>8,}" for i in range(30)]
+    content = "📊 本日のサマリー\n\n" + FENCE + "\n" + "\n".join(rows) + "\n" + FENCE + "\n\n以上"
+    limit = 200
+
+    chunks = split_message(content, limit)
+
+    assert len(chunks) >= 3
+    body = []
+    for chunk in chunks:
+        assert len(chunk) <= limit
+        states = _fence_states(chunk)
+        # どのメッセージもコードブロックが閉じた状態で終わる
+        assert not states[-1][1]
+        # 表の行はすべてコードブロックの中
+        body += [line for line, inside in states if inside and line.strip() != FENCE]
+    assert [line for line in body if line.startswith("業種")] == rows
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+import pandas as pd
+
+import log_store
+
+
+def _sector_rows(dates, rate):
+    return pd.DataFrame({
+        "日付": dates,
+        "業種": "電気機器",
+        "時価総額帯": "全体",
+        "上昇銘柄数": "10",
+        "下落銘柄数": "5",
+        "時価総額加重平均騰落率": str(rate),
+        "売買代金合計": "1,000",
+        "平均騰落率順位": "1",
+    })
+
+
+def test_mixed_format_seed_is_keyed_on_normalized_dates(tmp_path):
+    db = tmp_path / "logs.sqlite"
+    # 旧アップローダーは YYYY-MM-DD、現行は YYYY/MM/DD でシートに書いていた
+    seed = _sector_rows(["2025-12-23", "2025/12/24", "2025-12-25"], 0.5)
+    log_store.write_log("sector_log", seed, path=db)
+
+    # 同じ日を新しい表記で書き直しても重複しない
+    log_store.write_log("sector_log", _sector_rows(["2025/12/25"], 0.7), path=db)
+
+    stored = log_store.read_log("sector_log", path=db)
+    assert stored["日付"].tolist() == ["2025/12/25", "2025/12/24", "2025/12/23"]
+    assert stored["時価総額加重平均騰落率"].tolist() == [0.7, 0.5, 0.5]
+    # ウォーターマーク（YYYY/MM/DD）との比較で取りこぼさない
+    assert log_store.read_log("sector_log", after="2025/12/23", path=db)["日付"].tolist() == ["2025/12/25", "2025/12/24"]
+    assert log_store.normalize("sector_log", seed)["日付"].max() == "2025/12/25"
+
+
+def test_dates_stored_before_normalization_are_migrated(tmp_path):
+    db = tmp_path / "logs.sqlite"
+    log_store.connect(db).close()
+    conn = sqlite3.connect(db)
+    with conn:
+        conn.execute("PRAGMA user_version = 0")
+        conn.execute("INSERT INTO sector_log (日付, 業種, 時価総額帯) VALUES ('2025-12-24', '電気機器', '全体')")
+        conn.execute("INSERT INTO sector_log (日付, 業種, 時価総額帯) VALUES ('2025-12-25', '電気機器', '全体')")
+        conn.execute("INSERT INTO sector_log (日付, 業種, 時価総額帯) VALUES ('2025/12/25', '電気機器', '全体')")
+        conn.execute("INSERT INTO sync_state VALUES ('sector_log', '2025-12-25')")
+    conn.close()
+
+    assert log_store.read_log("sector_log", path=db)["日付"].tolist() == ["2025/12/25", "2025/12/24"]
+    assert log_store.get_watermark("sector_log", path=db) == "2025/12/25"
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import datetime
+import zipfile
+from pathlib import Path
+
+import pytest
+
+import cleanup_old_data
+import monthly_archive
+from raw_loader import list_raw_files
+
+RAW_DIR = Path("data/raw/japan_all_stock")
+
+
+@pytest.fixture(autouse=True)
+def work_dir(tmp_path, monkeypatch):
+    """data/ 以下の相対パスを tmp_path の下で使う"""
+    monkeypatch.chdir(tmp_path)
+    RAW_DIR.mkdir(parents=True)
+    return tmp_path
+
+
+def _write_day(day):
+    path = RAW_DIR / f"japan-all-stock-prices_{day}.csv"
+    path.write_text(f"SC,日付\n1301,{day}\n", encoding="cp932")
+    return path
+
+
+def test_archiving_an_already_archived_day_does_not_rewrite_the_zip():
+    path = _write_day("20250522")
+    assert monthly_archive.archive_files([path]) == 1
+    archive = monthly_archive.archive_path_for(path)
+    before = archive.stat()
+    content = archive.read_bytes()
+
+    # 同じ日を再取得して、もう一度アーカイブ
+    _write_day("20250522")
+    assert monthly_archive.archive_files([path]) == 1
+
+    after = archive.stat()
+    assert (after.st_mtime_ns, after.st_ino) == (before.st_mtime_ns, before.st_ino)
+    assert archive.read_bytes() == content
+    assert not path.exists()
+
+
+def test_cleanup_archives_only_closed_months():
+    for day in ["20250529", "20250530", "20250602", "20250603"]:
+        _write_day(day)
+
+    # 6/29 時点の期限は 5/30 → 5/29 は期限切れだが5月はまだ締まっていないので残す
+    cleanup_old_data.cleanup_old_files("data/raw", 30, "archive", today=datetime.date(2025, 6, 29))
+    assert not monthly_archive.ARCHIVE_DIR.exists()
+    assert len(list(RAW_DIR.iterdir())) == 4
+
+    # 7/1 時点の期限 = 6/1 → 5月だけが1回でまとめてアーカイブされる
+    cleanup_old_data.cleanup_old_files("data/raw", 30, "archive", today=datetime.date(2025, 7, 1))
+    archive = monthly_archive.ARCHIVE_DIR / "raw/japan_all_stock/japan-all-stock-prices_202505.zip"
+    with zipfile.ZipFile(archive) as zf:
+        assert sorted(zf.namelist()) == ["japan-all-stock-prices_20250529.csv", "japan-all-stock-prices_20250530.csv"]
+    assert sorted(p.name for p in RAW_DIR.iterdir()) == [
+        "japan-all-stock-prices_20250602.csv", "japan-all-stock-prices_20250603.csv"]
+
+    # アーカイブ済みの日も一覧・読込の対象
+    files = list_raw_files(RAW_DIR, "japan-all-stock-prices_*.csv")
+    assert [p.name[-12:-4] for p in files] == ["20250529", "20250530", "20250602", "20250603"]
+    assert monthly_archive.open_member(files[0]).read().decode("cp932").endswith("20250529\n")
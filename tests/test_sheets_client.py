@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+pytest.importorskip("gspread")
+pytest.importorskip("google.oauth2.service_account")
+import sheets_client  # noqa: E402
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """POST /slow は応答前に待つ（読込タイムアウト）、POST /busy は1回目だけ 429"""
+    hits = {}
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        count = self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        if self.path == "/slow":
+            time.sleep(0.5)
+        if self.path == "/busy" and count == 1:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.hits = {}
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def session():
+    s = requests.Session()
+    s.mount("http://", sheets_client.sheets_adapter())
+    return s
+
+
+def test_post_is_not_replayed_after_read_timeout(server, session):
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        session.post(server + "/slow", json={"requests": []}, timeout=0.2)
+    time.sleep(0.6)  # 再送されていればこの間に届く
+    assert _Handler.hits["/slow"] == 1
+
+
+def test_post_is_retried_on_429(server, session):
+    res = session.post(server + "/busy", json={"requests": []}, timeout=5)
+    assert res.status_code == 200
+    assert _Handler.hits["/busy"] == 2
+
+
+# ==============================
+# シート情報の保存・再利用
+# ==============================
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    from google.auth.credentials import AnonymousCredentials
+    monkeypatch.setattr(sheets_client, "METADATA_CACHE_FILE", tmp_path / "sheets_metadata.json")
+    monkeypatch.setattr(sheets_client, "_client", sheets_client.gspread.Client(AnonymousCredentials()))
+    monkeypatch.setattr(sheets_client, "_spreadsheets", {})
+    monkeypatch.setattr(sheets_client, "_worksheets", {})
+    return sheets_client._client
+
+
+class _Spreadsheet:
+    def __init__(self, client, titles):
+        self.fetches = 0
+        self.client = client
+        self.titles = titles
+
+    def worksheets(self):
+        self.fetches += 1
+        return [
+            sheets_client.gspread.Worksheet(
+                self, {"sheetId": i, "title": t, "gridProperties": {"rowCount": 100, "columnCount": 8}},
+                "sheet-id", self.client.http_client)
+            for i, t in enumerate(self.titles)
+        ]
+
+
+def test_worksheet_metadata_is_reused_across_processes(client):
+    spreadsheet = _Spreadsheet(client, ["sector_log", "momentum_log"])
+    sheets_client._spreadsheets["sheet-id"] = spreadsheet
+
+    first = sheets_client.open_worksheet("momentum_log", "sheet-id")
+    assert (first.id, spreadsheet.fetches) == (1, 1)
+
+    # 別プロセス相当：プロセス内のキャッシュが空でもシート情報は取得しない
+    sheets_client._spreadsheets.clear()
+    sheets_client._worksheets.clear()
+    again = sheets_client.open_worksheet("sector_log", "sheet-id")
+    assert (again.id, again.title, again.spreadsheet_id) == (0, "sector_log", "sheet-id")
+    assert again.client is client.http_client
+
+
+def test_worksheet_metadata_is_dropped_on_404(client):
+    sheets_client._spreadsheets["sheet-id"] = _Spreadsheet(client, ["sector_log"])
+    sheets_client.open_worksheet("sector_log", "sheet-id")
+
+    response = requests.Response()
+    response.status_code = 404
+    response.url = "https://sheets.googleapis.com/v4/spreadsheets/sheet-id/values/sector_log"
+    sheets_client._forget_on_error(response)
+
+    assert "sheet-id" not in sheets_client._load_metadata()
+    assert not sheets_client._worksheets
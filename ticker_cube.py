@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from raw_loader import load_stock_prices, list_raw_files
+
+# ==============================
+# 設定
+# ==============================
+CUBE_DIR = Path("data/cube")
+
+# 銘柄×営業日で保持する項目（float32）→ ファイル名
+FIELDS = {
+    "株価": "price",
+    "前日比（％）": "change_pct",
+    "出来高": "volume",
+    "売買代金（千円）": "turnover",
+    "時価総額（百万円）": "market_cap",
+}
+CUBE_COLUMNS = ["SC", "名称", "業種", "市場"] + list(FIELDS)
+TICKER_COLUMNS = ["SC", "名称", "業種", "市場", "初回日付", "最終日付"]
+
+DAY_CHUNK = 64               # 営業日方向は 64 日ずつ領域を確保
+MIN_TICKER_CAPACITY = 1024   # 銘柄方向は不足時に 1.25 倍へ拡張
+
+
+# ==============================
+# 銘柄×営業日キューブ
+# ==============================
+class TickerCube:
+    """
+    項目ごとに (営業日, 銘柄) の float32 配列を memmap で保持
+    - 銘柄（SC）は初めて出た順に列を割り当てる（上場は列の追加、廃止後は NaN のまま）
+    - 名称・業種・市場は銘柄表（tickers.csv）に保持
+    - window() は memmap のスライス（コピーなし）を返す
+    """
+
+    def __init__(self, path=CUBE_DIR, writable=False):
+        self.path = Path(path)
+        self.writable = writable
+        self.meta = self._load_meta()
+        self.tickers = self._load_tickers()
+        self._ticker_index = pd.Index(self.tickers["SC"])
+        self._arrays = {}
+
+    # --- メタ情報・銘柄表 ---
+    def _load_meta(self):
+        meta_path = self.path / "meta.json"
+        if meta_path.exists():
+            with open(meta_path, encoding="utf-8") as f:
+                return json.load(f)
+        return {"fields": list(FIELDS), "dates": [], "day_capacity": 0, "ticker_capacity": 0}
+
+    def _load_tickers(self):
+        tickers_path = self.path / "tickers.csv"
+        if tickers_path.exists():
+            return pd.read_csv(tickers_path, encoding="utf-8-sig", dtype=str)
+        return pd.DataFrame({c: pd.Series(dtype=str) for c in TICKER_COLUMNS})
+
+    def _save(self):
+        """配列を書き出してから銘柄表・メタ情報を一時ファイル経由で置き換え"""
+        for array in self._arrays.values():
+            array.flush()
+        tmp_path = self.path / "tickers.csv.part"
+        self.tickers.to_csv(tmp_path, index=False, encoding="utf-8-sig")
+        tmp_path.replace(self.path / "tickers.csv")
+        tmp_path = self.path / "meta.json.part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+        tmp_path.replace(self.path / "meta.json")
+
+    @property
+    def dates(self):
+        return self.meta["dates"]
+
+    @property
+    def n_tickers(self):
+        return len(self.tickers)
+
+    # --- 配列 ---
+    def _file(self, field):
+        return self.path / f"{FIELDS[field]}.f32"
+
+    def _shape(self):
+        return (self.meta["day_capacity"], self.meta["ticker_capacity"])
+
+    def array(self, field):
+        """項目の memmap（確保済み領域全体。使用中は [:len(dates), :n_tickers]）"""
+        if field not in self._arrays:
+            if not self._file(field).exists() or 0 in self._shape():
+                return np.empty((0, 0), dtype=np.float32)
+            mode = "r+" if self.writable else "r"
+            self._arrays[field] = np.memmap(self._file(field), dtype=np.float32, mode=mode, shape=self._shape())
+        return self._arrays[field]
+
+    def _grow(self, n_days, n_tickers):
+        """必要なら領域を拡張（営業日は末尾に追記、銘柄は 25% の余裕を持たせて詰め替え）"""
+        day_capacity, ticker_capacity = self._shape()
+        new_tickers = ticker_capacity
+        if n_tickers > ticker_capacity:
+            new_tickers = max(n_tickers + n_tickers // 4, MIN_TICKER_CAPACITY)
+        new_days = day_capacity
+        if n_days > day_capacity:
+            new_days = max(n_days, day_capacity + DAY_CHUNK)
+        if (new_days, new_tickers) == (day_capacity, ticker_capacity):
+            return
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        for field in FIELDS:
+            old = self.array(field) if day_capacity and ticker_capacity else None
+            self._arrays.pop(field, None)
+            if new_tickers == ticker_capacity and old is not None:
+                # 銘柄数が変わらなければファイル末尾を伸ばすだけ
+                del old
+                with open(self._file(field), "r+b") as f:
+                    f.truncate(new_days * new_tickers * 4)
+                array = np.memmap(self._file(field), dtype=np.float32, mode="r+", shape=(new_days, new_tickers))
+                array[day_capacity:] = np.nan
+            else:
+                tmp_path = self._file(field).with_suffix(".f32.part")
+                array = np.memmap(tmp_path, dtype=np.float32, mode="w+", shape=(new_days, new_tickers))
+                array[:] = np.nan
+                if old is not None:
+                    array[:day_capacity, :ticker_capacity] = old
+                    del old
+                array.flush()
+                del array
+                os.replace(tmp_path, self._file(field))
+                array = np.memmap(self._file(field), dtype=np.float32, mode="r+", shape=(new_days, new_tickers))
+            self._arrays[field] = array
+        self.meta["day_capacity"], self.meta["ticker_capacity"] = new_days, new_tickers
+
+    # --- 追記 ---
+    def append_day(self, date_str, stock_df):
+        """
+        1日分の全銘柄データを追記（同じ日付は上書き、古い日付の差し込みは不可）
+        stock_df: raw_loader で読んだ DataFrame（SC・名称・業種・市場・FIELDS の列）
+        """
+        if not self.writable:
+            raise PermissionError("writable=True で開いてください")
+        dates = self.meta["dates"]
+        if date_str in dates:
+            row = dates.index(date_str)
+        elif dates and date_str < dates[-1]:
+            raise ValueError(f"{date_str} は最終日 {dates[-1]} より前のため追記できません")
+        else:
+            row = len(dates)
+
+        df = stock_df.drop_duplicates("SC", keep="last")
+        sc = df["SC"].astype(str).str.strip()
+
+        # 新規上場（初出の SC）は列を追加
+        new_sc = sc[~sc.isin(self._ticker_index)]
+        if len(new_sc):
+            added = pd.DataFrame({"SC": new_sc.to_numpy(), "初回日付": date_str})
+            self.tickers = pd.concat([self.tickers, added], ignore_index=True)
+            self._ticker_index = pd.Index(self.tickers["SC"])
+
+        positions = self._ticker_index.get_indexer(sc)
+        self._grow(row + 1, self.n_tickers)
+
+        # 銘柄表（名称・業種・市場は最新の値で更新）
+        for col in ["名称", "業種", "市場"]:
+            if col in df.columns:
+                self.tickers.loc[positions, col] = df[col].astype(str).to_numpy()
+        self.tickers.loc[positions, "最終日付"] = date_str
+
+        for field in FIELDS:
+            array = self.array(field)
+            array[row, :] = np.nan
+            if field in df.columns:
+                array[row, positions] = df[field].to_numpy(dtype=np.float32, na_value=np.nan)
+
+        if row == len(dates):
+            dates.append(date_str)
+        self._save()
+        return row
+
+    def append_file(self, stock_file):
+        """生CSV（またはキャッシュ）1ファイル分を追記"""
+        date_str = Path(stock_file).stem.split("_")[-1]
+        return self.append_day(date_str, load_stock_prices(stock_file, columns=CUBE_COLUMNS))
+
+    # --- 読込 ---
+    def window(self, field, end=None, n_days=None, start=None):
+        """
+        営業日の範囲を切り出し（memmap のビュー、コピーなし）
+        end / start: YYYYMMDD（省略時は最終日／先頭）、n_days: end から遡る営業日数
+        戻り値: (日付リスト, 配列[営業日, 銘柄])  ※列は tickers の行順
+        """
+        dates = self.meta["dates"]
+        stop = len(dates) if end is None else np.searchsorted(dates, end, side="right")
+        if start is not None:
+            begin = np.searchsorted(dates, start, side="left")
+        elif n_days is not None:
+            begin = max(0, stop - n_days)
+        else:
+            begin = 0
+        return dates[begin:stop], self.array(field)[begin:stop, :self.n_tickers]
+
+    def frame(self, field, **kwargs):
+        """window() を DataFrame（行=日付、列=SC）にしたもの（コピー）"""
+        dates, values = self.window(field, **kwargs)
+        return pd.DataFrame(np.array(values), index=dates, columns=self.tickers["SC"])
+
+    def sector_sum(self, field, **kwargs):
+        """
+        window() を業種（銘柄表の最新値）ごとに合計した DataFrame（行=日付、列=業種）
+        ※ float32 で保持しているため、売買代金などの合計は生CSVからの集計と下位桁が一致しない
+        """
+        dates, values = self.window(field, **kwargs)
+        codes, sectors = pd.factorize(self.tickers["業種"])
+        onehot = np.zeros((self.n_tickers, len(sectors)))
+        onehot[np.flatnonzero(codes >= 0), codes[codes >= 0]] = 1.0
+        sums = np.nan_to_num(np.asarray(values, dtype=np.float64)) @ onehot
+        return pd.DataFrame(sums, index=dates, columns=sectors)
+
+
+# ==============================
+# 生CSVからの一括作成
+# ==============================
+def build_cube(stock_files, path=CUBE_DIR):
+    """未登録の日付だけを古い順に追記（最終日より前の欠損日は飛ばす）"""
+    cube = TickerCube(path, writable=True)
+    known = set(cube.dates)
+    added = 0
+    for stock_file in sorted(stock_files):
+        date_str = Path(stock_file).stem.split("_")[-1]
+        if date_str in known or (cube.dates and date_str < cube.dates[-1]):
+            continue
+        cube.append_file(stock_file)
+        added += 1
+    return cube, added
+
+
+if __name__ == "__main__":
+    files = list_raw_files("data/raw/japan_all_stock", "japan-all-stock-prices_*.csv")
+    cube, added = build_cube(files)
+    size_mb = sum(cube._file(f).stat().st_size for f in FIELDS) / 1024 ** 2 if cube.dates else 0
+    print(f"✅ {added} 日分を追加（合計 {len(cube.dates)} 日 × {cube.n_tickers:,} 銘柄、{size_mb:.1f} MB）→ {CUBE_DIR}")
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from ticker_cube import TickerCube
+
+# ==============================
+# 設定
+# ==============================
+OUTPUT_DIR = Path("data/processed_data/ticker_momentum")
+
+RATIO_PAIRS = [(5, 20), (3, 10)]  # 売買代金の (短期, 長期) 平均比率
+RETURN_DAYS = [5, 20]             # N日騰落率（％）
+RANK_COL = "売買代金5日平均/20日平均比率"
+TOP_K_MARKET = 30                 # 全市場の上位件数
+TOP_K_SECTOR = 5                  # 業種ごとの上位件数
+MIN_TURNOVER = 50_000             # 長期平均売買代金（千円）の下限（薄商い銘柄の比率の跳ねを除外）
+
+TURNOVER_WINDOWS = sorted({n for pair in RATIO_PAIRS for n in pair})
+WINDOW_DAYS = max(max(TURNOVER_WINDOWS), max(RETURN_DAYS) + 1)
+
+
+# ==============================
+# 銘柄別の指標
+# ==============================
+def ticker_metrics(cube, date_str=None):
+    """
+    キューブの直近 WINDOW_DAYS 営業日から銘柄ごとの売買代金比率・N日騰落率を計算
+    戻り値: (日付, DataFrame)  ※行は cube.tickers の順（当日データの無い銘柄も含む）
+    """
+    dates, turnover = cube.window("売買代金（千円）", end=date_str, n_days=WINDOW_DAYS)
+    if not dates:
+        return None, None
+    _, price = cube.window("株価", end=date_str, n_days=WINDOW_DAYS)
+    n_days = len(dates)
+
+    # 営業日方向の累積和：直近 n 日の平均 =（末尾の累積和 − n 日前の累積和）/ 上場日数
+    values = np.asarray(turnover, dtype=np.float64)
+    listed = ~np.isnan(values)
+    zeros = np.zeros((1, values.shape[1]))
+    csum = np.vstack([zeros, np.cumsum(np.where(listed, values, 0.0), axis=0)])
+    count = np.vstack([zeros, np.cumsum(listed, axis=0)])
+    means = {}
+    for n in TURNOVER_WINDOWS:
+        n = min(n, n_days)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means[n] = (csum[-1] - csum[-1 - n]) / (count[-1] - count[-1 - n])
+
+    # 売買不成立の日は直前の株価で埋めてから騰落率を計算
+    closes = pd.DataFrame(np.asarray(price, dtype=np.float64)).ffill().to_numpy()
+
+    df = cube.tickers[["SC", "名称", "市場", "業種"]].copy()
+    df["株価"] = closes[-1]
+    df["売買代金（千円）"] = values[-1]
+    for short, long in RATIO_PAIRS:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ratio = means[min(short, n_days)] / means[min(long, n_days)]
+        df[f"売買代金{short}日平均/{long}日平均比率"] = np.where(np.isfinite(ratio), ratio, np.nan).round(3)
+    for n in RETURN_DAYS:
+        if n < n_days:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                df[f"{n}日騰落率"] = ((closes[-1] / closes[-1 - n] - 1) * 100).round(2)
+        else:
+            df[f"{n}日騰落率"] = np.nan
+    df["長期平均売買代金"] = means[min(max(TURNOVER_WINDOWS), n_days)]
+    return dates[-1], df
+
+
+# ==============================
+# 上位銘柄の選択
+# ==============================
+def top_k(values, k):
+    """値の大きい順に上位 k 件の位置（argpartition で k 件を選んでから、その k 件だけを並べる）"""
+    if len(values) > k:
+        idx = np.argpartition(-values, k - 1)[:k]
+    else:
+        idx = np.arange(len(values))
+    return idx[np.argsort(-values[idx], kind="stable")]
+
+
+def screen(cube, date_str=None, k_market=TOP_K_MARKET, k_sector=TOP_K_SECTOR):
+    """
+    全市場・業種ごとに RANK_COL の上位銘柄を抽出
+    当日データがあり、長期平均売買代金が MIN_TURNOVER 以上の銘柄が対象
+    """
+    date, df = ticker_metrics(cube, date_str)
+    if df is None:
+        return None
+
+    eligible = (
+        df["売買代金（千円）"].notna()
+        & (df["長期平均売買代金"] >= MIN_TURNOVER)
+        & df[RANK_COL].notna()
+    )
+    df = df[eligible].drop(columns="長期平均売買代金").reset_index(drop=True)
+    scores = df[RANK_COL].to_numpy()
+
+    picks = [("全市場", top_k(scores, k_market))]
+    codes, sectors = pd.factorize(df["業種"], sort=True)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(sectors) + 1))
+    for i, sector in enumerate(sectors):
+        members = order[bounds[i]:bounds[i + 1]]
+        picks.append((sector, members[top_k(scores[members], k_sector)]))
+
+    frames = []
+    for scope, idx in picks:
+        part = df.iloc[idx]
+        part.insert(0, "順位", np.arange(1, len(idx) + 1))
+        part.insert(0, "区分", scope)
+        frames.append(part)
+    result = pd.concat(frames, ignore_index=True)
+    result.insert(0, "日付", f"{date[:4]}/{date[4:6]}/{date[6:]}")
+    return result
+
+
+# ==============================
+# メイン処理
+# ==============================
+def run(cube=None, date_str=None):
+    """ticker_momentum を作成して保存（キューブは 3-data_processor で当日分まで追記済みの前提）"""
+    cube = cube or TickerCube()
+    result = screen(cube, date_str)
+    if result is None:
+        print("⚠️ ticker cube が空のため ticker_momentum をスキップ")
+        return None
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    output_file = OUTPUT_DIR / f"{result['日付'].iloc[0].replace('/', '')}_ticker_momentum.csv"
+    result.to_csv(output_file, index=False, encoding="utf-8-sig")
+    print(f"✅ ticker_momentum 保存: {output_file}")
+    return result
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from raw_loader import load_stock_prices
+
+# ==============================
+# 設定
+# ==============================
+STATE_FILE = Path("data/state/sector_turnover.csv")
+
+# (短期, 長期) 移動平均の組 →「売買代金{短期}日平均/{長期}日平均比率」列
+# ※ 5/20・3/10 は stage 5/6 とシートの列として使用中
+MOMENTUM_PAIRS = [(5, 20), (3, 10)]
+# (短期, 長期) EWMA スパンの組 →「売買代金EWMA{短期}/EWMA{長期}比率」列（例: [(5, 20)]、空なら出力しない）
+EWMA_PAIRS = []
+
+MOMENTUM_WINDOWS = sorted({n for pair in MOMENTUM_PAIRS for n in pair})
+EWMA_SPANS = sorted({n for pair in EWMA_PAIRS for n in pair})
+LOOKBACK_DAYS = max(MOMENTUM_WINDOWS)  # 過去20営業日分（EWMA は状態にある全期間を使用）
+
+VALUE_COL = "売買代金（千円）"
+STATE_COLUMNS = ["日付", "業種", VALUE_COL]
+
+
+def momentum_columns():
+    """momentum_summary の列（設定から決まる）"""
+    return (
+        STATE_COLUMNS
+        + [f"売買代金{n}日平均" for n in MOMENTUM_WINDOWS]
+        + [f"売買代金EWMA{n}" for n in EWMA_SPANS]
+        + [f"売買代金{s}日平均/{l}日平均比率" for s, l in MOMENTUM_PAIRS]
+        + [f"売買代金EWMA{s}/EWMA{l}比率" for s, l in EWMA_PAIRS]
+    )
+
+
+# ==============================
+# 日次の業種別売買代金
+# ==============================
+def sector_turnover(stock_df, date_str):
+    """
+    1日分の個別銘柄DataFrameから業種別売買代金合計を作成
+    stock_df: raw_loader で読み込んだ DataFrame（業種名統一・数値化済み）
+    """
+    day_df = stock_df.groupby("業種", as_index=False, observed=True)[VALUE_COL].sum()
+    day_df["業種"] = day_df["業種"].astype(object)
+    day_df.insert(0, "日付", pd.to_datetime(date_str, format="%Y%m%d"))
+    return day_df
+
+
+def read_sector_turnover(stock_file):
+    """生CSV（またはキャッシュ）1ファイル分の業種別売買代金合計を返す（初回・欠損日の補完用）"""
+    df_tmp = load_stock_prices(stock_file, columns=STATE_COLUMNS).dropna(subset=["日付"])
+    day_df = df_tmp.groupby(["日付", "業種"], as_index=False, observed=True)[VALUE_COL].sum()
+    day_df["業種"] = day_df["業種"].astype(object)
+    return day_df
+
+
+# ==============================
+# 状態ファイルの読み書き
+# ==============================
+def load_state(path=STATE_FILE):
+    """保存済みの日次×業種 売買代金を読み込む（無ければ空）"""
+    path = Path(path)
+    if not path.exists():
+        return pd.DataFrame({
+            "日付": pd.Series(dtype="datetime64[ns]"),
+            "業種": pd.Series(dtype=object),
+            VALUE_COL: pd.Series(dtype=float),
+        })
+    state = pd.read_csv(path, encoding="utf-8-sig")
+    state["日付"] = pd.to_datetime(state["日付"], format="%Y/%m/%d")
+    state[VALUE_COL] = state[VALUE_COL].astype(float)
+    return state[STATE_COLUMNS]
+
+
+def save_state(state, path=STATE_FILE):
+    """一時ファイルに書いてからリネーム（途中で落ちても壊れない）"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    out = state.copy()
+    out["日付"] = out["日付"].dt.strftime("%Y/%m/%d")
+    tmp_path = path.with_name(path.name + ".part")
+    out.to_csv(tmp_path, index=False, encoding="utf-8-sig")
+    tmp_path.replace(path)
+
+
+def upsert_day(state, day_df):
+    """同じ日付の行を置き換えて追加（同日の再実行でも二重計上しない。複数日分もまとめて可）"""
+    if day_df.empty:
+        return state
+    state = state[~state["日付"].isin(day_df["日付"].unique())]
+    state = pd.concat([state, day_df[STATE_COLUMNS]], ignore_index=True)
+    return state.sort_values(["日付", "業種"], ignore_index=True)
+
+
+def backfill_state(state, stock_files, date_str, lookback=LOOKBACK_DAYS):
+    """
+    対象日までの直近 lookback ファイルのうち、状態に無い日だけ生CSVから補完
+    （初回実行や欠損日があった場合のみ生CSVを読む）
+    """
+    stock_files_sorted = sorted(stock_files)
+    target_idx = [i for i, f in enumerate(stock_files_sorted) if f.stem.endswith(date_str)]
+    if not target_idx:
+        return state
+    target_idx = target_idx[0]
+    recent_files = stock_files_sorted[max(0, target_idx - (lookback - 1)):target_idx + 1]
+
+    known = set(state["日付"].dt.strftime("%Y%m%d"))
+    for f in recent_files:
+        if f.stem.split("_")[-1] in known:
+            continue
+        print(f"🧩 売買代金状態を補完: {f.name}")
+        state = upsert_day(state, read_sector_turnover(f))
+    return state
+
+
+# ==============================
+# モメンタム計算（共通）
+# ==============================
+def add_momentum_columns(daily_sum):
+    """
+    日付×業種の売買代金に移動平均・EWMA・比率の列を追加（MOMENTUM_PAIRS / EWMA_PAIRS の設定どおり）
+    業種・日付順に並べた売買代金の累積和1本から、各窓の合計を「累積和の差」で求めるため、
+    窓の数によらず全体を1回なめるだけで済む（rolling(n, min_periods=1).mean() と同じ値）
+    """
+    daily_sum = daily_sum.sort_values(["業種", "日付"], ignore_index=True)
+    values = daily_sum[VALUE_COL].to_numpy(dtype=float)
+
+    # 売買代金は整数値のため、累積和・差分とも float64 で誤差なく計算できる
+    csum = np.concatenate([[0.0], np.cumsum(values)])
+    end = np.arange(1, len(values) + 1)
+    position = daily_sum.groupby("業種").cumcount().to_numpy()  # 業種内で何日目か
+    for n in MOMENTUM_WINDOWS:
+        count = np.minimum(position + 1, n)
+        daily_sum[f"売買代金{n}日平均"] = (csum[end] - csum[end - count]) / count
+
+    grouped = daily_sum.groupby("業種")[VALUE_COL]
+    for n in EWMA_SPANS:
+        daily_sum[f"売買代金EWMA{n}"] = grouped.ewm(span=n, adjust=False).mean().reset_index(level=0, drop=True)
+
+    for short, long in MOMENTUM_PAIRS:
+        daily_sum[f"売買代金{short}日平均/{long}日平均比率"] = (
+            daily_sum[f"売買代金{short}日平均"] / daily_sum[f"売買代金{long}日平均"]
+        ).round(3)
+    for short, long in EWMA_PAIRS:
+        daily_sum[f"売買代金EWMA{short}/EWMA{long}比率"] = (
+            daily_sum[f"売買代金EWMA{short}"] / daily_sum[f"売買代金EWMA{long}"]
+        ).round(3)
+
+    return daily_sum[momentum_columns()].sort_values(["日付", "業種"], ignore_index=True)
+
+
+# ==============================
+# モメンタム計算（状態から）
+# ==============================
+def momentum_from_state(state, date_str, lookback=LOOKBACK_DAYS):
+    """
+    状態から対象日のモメンタム（設定した移動平均・EWMA と比率）を計算
+    直近 lookback 営業日だけを切り出して計算するため、生CSVから計算した結果と一致する
+    （EWMA を設定している場合は状態にある全期間を使用）
+    """
+    target_date = pd.to_datetime(date_str, format="%Y%m%d")
+    dates = sorted(state.loc[state["日付"] <= target_date, "日付"].unique())
+    if not EWMA_PAIRS:
+        dates = dates[-lookback:]
+    if not dates:
+        return None
+
+    daily_sum = add_momentum_columns(state[state["日付"].isin(dates)])
+
+    latest_date = daily_sum["日付"].max()
+    momentum_df = daily_sum[daily_sum["日付"] == latest_date].copy()
+    momentum_df["日付"] = momentum_df["日付"].dt.strftime("%Y/%m/%d")
+
+    return momentum_df
+
+
+# ==============================
+# モメンタム計算（全期間一括）
+# ==============================
+def momentum_history(state):
+    """
+    日付×業種の売買代金表から、全営業日分のモメンタムを一括計算
+    各業種が毎営業日存在する前提で、日次の momentum_from_state と同じ値になる
+    """
+    return add_momentum_columns(state)